@@ -0,0 +1,457 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+from xml.etree import ElementTree
+
+SECTION_KEY = 1
+
+LABELS = ['overlays', '4K', 'Remux', 'Watched', 'Kids', 'Favorite', 'Stale']
+LABEL_IDS = {label: 1000 + index for index, label in enumerate(LABELS)}
+
+TYPE_IDS = {'movie': 1, 'show': 2, 'season': 3, 'episode': 4}
+TYPE_NAMES = {number: name for name, number in TYPE_IDS.items()}
+
+DAY = 86400
+
+class Level:
+    """One item type of the synthetic section, e.g. the episodes of a TV section"""
+
+    def __init__(self, libtype: str, count: int, first_key: int):
+        self.libtype = libtype
+        self.count = count
+        self.first_key = first_key
+
+    def contains(self, key: int) -> bool:
+        return self.first_key <= key < self.first_key + self.count
+
+class SyntheticLibrary:
+    """A generated library section whose items only take memory once they change
+
+    Every item's title, dates and starting labels are derived from its index,
+    so a 500k item section costs nothing until operations edit it. Labels,
+    selected posters and deletions are kept as overrides.
+    """
+
+    def __init__(self, size: int, libtype: str = 'movie'):
+        self.libtype = libtype
+        self.now = int(time.time())
+        if libtype == 'show':
+            shows = max(1, size // 60)
+            self.levels = [Level('show', shows, 1), Level('season', shows * 3, 1 + shows),
+                           Level('episode', size, 1 + shows * 4)]
+        else:
+            self.levels = [Level('movie', size, 1)]
+        self.labels: Dict[int, List[str]] = {}
+        self.updated: Dict[int, int] = {}
+        self.reset_posters = set()
+        self.deleted = set()
+        self.version = 0
+        self._lock = threading.Lock()
+        self._matches: Dict[Any, Tuple[int, List[int]]] = {}
+
+    def level(self, libtype: str) -> Optional[Level]:
+        return next((level for level in self.levels if level.libtype == libtype), None)
+
+    def level_of(self, key: int) -> Optional[Level]:
+        return next((level for level in self.levels if level.contains(key)), None)
+
+    def exists(self, key: int) -> bool:
+        return self.level_of(key) is not None and key not in self.deleted
+
+    def item_labels(self, key: int) -> List[str]:
+        labels = self.labels.get(key)
+        if labels is None:
+            labels = [label for index, label in enumerate(LABELS) if (key + index) % (index + 2) == 0]
+        return labels
+
+    def added_at(self, key: int) -> int:
+        # One item in ten was added during the last day, the rest over the past years
+        if key % 10 == 0:
+            return self.now - (key * 37) % DAY
+        return self.now - 30 * DAY - (key * 7919) % (900 * DAY)
+
+    def updated_at(self, key: int) -> int:
+        return self.updated.get(key, self.added_at(key))
+
+    def default_poster_selected(self, key: int) -> bool:
+        return key % 3 == 0 or key in self.reset_posters
+
+    def item(self, key: int) -> Dict[str, Any]:
+        """Get an item's attributes as listed by the server"""
+        libtype = self.level_of(key).libtype
+        item = {
+            'ratingKey': str(key),
+            'key': f"/library/metadata/{key}",
+            'type': libtype,
+            'title': f"{libtype.title()} {key}",
+            'librarySectionID': str(SECTION_KEY),
+            'addedAt': str(self.added_at(key)),
+            'updatedAt': str(self.updated_at(key)),
+            'thumb': f"/library/metadata/{key}/thumb/{self.updated_at(key)}",
+            'year': str(1970 + key % 55),
+        }
+        if libtype in ('movie', 'episode'):
+            item['duration'] = str((90 if libtype == 'movie' else 42) * 60000 + (key % 600) * 1000)
+        return item
+
+    def query(self, libtype: str, filters: Dict[str, str], sort: Optional[str]) -> List[int]:
+        """Get the keys of the items of a type matching the section filters"""
+        cache_key = (libtype, tuple(sorted(filters.items())), sort)
+        with self._lock:
+            cached = self._matches.get(cache_key)
+            if cached and cached[0] == self.version:
+                return cached[1]
+        level = self.level(libtype)
+        keys = []
+        if level:
+            keys = [
+                key for key in range(level.first_key, level.first_key + level.count)
+                if key not in self.deleted and self._matches_filters(key, filters)
+            ]
+        if sort:
+            field, _, direction = sort.partition(':')
+            value = self.added_at if field == 'addedAt' else self.updated_at
+            keys.sort(key=value, reverse=direction == 'desc')
+        with self._lock:
+            self._matches[cache_key] = (self.version, keys)
+        return keys
+
+    def _matches_filters(self, key: int, filters: Dict[str, str]) -> bool:
+        for field, value in filters.items():
+            if field in ('label', 'label!'):
+                wanted = {int(label_id) for label_id in value.split(',')}
+                has = any(LABEL_IDS.get(label) in wanted for label in self.item_labels(key))
+                if has != (field == 'label'):
+                    return False
+            elif field == 'addedAt>>' and self.added_at(key) <= int(value):
+                return False
+            elif field == 'updatedAt>>' and self.updated_at(key) <= int(value):
+                return False
+        return True
+
+    def edit_labels(self, keys: List[int], remove: Optional[List[str]] = None, labels: Optional[List[str]] = None) -> None:
+        with self._lock:
+            for key in keys:
+                if remove is not None:
+                    self.labels[key] = [label for label in self.item_labels(key) if label not in remove]
+                else:
+                    self.labels[key] = list(labels)
+                self.updated[key] = int(time.time())
+            self.version += 1
+
+    def select_poster(self, key: int, default: bool) -> None:
+        with self._lock:
+            if default:
+                self.reset_posters.add(key)
+            else:
+                self.reset_posters.discard(key)
+
+    def delete(self, key: int) -> None:
+        with self._lock:
+            self.deleted.add(key)
+            self.version += 1
+
+class BenchStats:
+    """Request counts and server-side latencies of the stand-in"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.by_route: Dict[str, int] = {}
+        self.latencies: List[float] = []
+
+    def record(self, route: str, latency: float, error: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.by_route[route] = self.by_route.get(route, 0) + 1
+            self.latencies.append(latency)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+
+        def percentile(fraction: float) -> float:
+            return latencies[int(fraction * (len(latencies) - 1))] * 1000 if latencies else 0.0
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "by_route": dict(self.by_route),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+        }
+
+class FakePlexServer(ThreadingHTTPServer):
+    """Stand-in for the part of the Plex API the operations use
+
+    Serves the server identity, section list and listings (with paging,
+    label, addedAt and updatedAt filters and the filter metadata plexapi
+    validates against), item metadata, multi-item label edits, posters,
+    refresh and delete. Responses are XML, or JSON when the client asks
+    for it. Each request waits for the configured latency plus random
+    jitter, and fails with a 503 at the configured error rate.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], size: int, libtype: str = 'movie',
+                 latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0):
+        super().__init__(address, FakePlexHandler)
+        self.size = size
+        self.libtype = libtype
+        self.library = SyntheticLibrary(size, libtype)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.stats = BenchStats()
+
+    def reset(self, size: Optional[int] = None) -> None:
+        """Regenerate the library and clear the stats between benchmark runs"""
+        self.size = size or self.size
+        self.library = SyntheticLibrary(self.size, self.libtype)
+        self.stats.reset()
+
+def _element(tag: str, attributes: Dict[str, Any], children: Optional[List[ElementTree.Element]] = None) -> ElementTree.Element:
+    element = ElementTree.Element(tag, {key: str(value) for key, value in attributes.items() if value is not None})
+    element.extend(children or [])
+    return element
+
+class FakePlexHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: FakePlexServer
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._handle('GET')
+
+    def do_PUT(self) -> None:
+        self._handle('PUT')
+
+    def do_POST(self) -> None:
+        self._handle('POST')
+
+    def do_DELETE(self) -> None:
+        self._handle('DELETE')
+
+    def _handle(self, method: str) -> None:
+        started = time.monotonic()
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/') or '/'
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        if path.startswith('/__bench__'):
+            self._bench(path, params)
+            return
+
+        route = re.sub(r'\d+', '{id}', path)
+        error = False
+        delay = self.server.latency + random.uniform(-self.server.jitter, self.server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if path.startswith('/library/') and random.random() < self.server.error_rate:
+            error = True
+            self._send(503, b'Service Unavailable', 'text/plain')
+        else:
+            try:
+                status, container = self._route(method, path, params)
+                self._send_container(status, container)
+            except Exception as e:
+                error = True
+                self._send(500, str(e).encode(), 'text/plain')
+        self.server.stats.record(f"{method} {route}", time.monotonic() - started, error)
+
+    def _bench(self, path: str, params: Dict[str, str]) -> None:
+        if path == '/__bench__/reset':
+            self.server.reset(int(params['items']) if 'items' in params else None)
+        self._send(200, json.dumps(self.server.stats.snapshot()).encode(), 'application/json')
+
+    def _route(self, method: str, path: str, params: Dict[str, str]) -> Tuple[int, ElementTree.Element]:
+        library = self.server.library
+        if path == '/':
+            return 200, _element('MediaContainer', {
+                'friendlyName': 'Benchmark Server', 'machineIdentifier': 'benchmark',
+                'version': '1.40.0.0', 'platform': 'Linux', 'myPlex': 0,
+            })
+        if path in ('/status/sessions', '/transcode/sessions'):
+            return 200, _element('MediaContainer', {'size': 0})
+        if path == '/library':
+            return 200, _element('MediaContainer', {'title1': 'Plex Library'})
+        if path == '/library/sections':
+            return 200, _element('MediaContainer', {'size': 1}, [
+                _element('Directory', {
+                    'key': SECTION_KEY, 'type': library.libtype, 'title': 'Benchmark',
+                    'agent': 'tv.plex.agents.movie', 'scanner': 'Plex Movie', 'language': 'en-US',
+                    'uuid': 'benchmark-section', 'updatedAt': library.now, 'createdAt': library.now,
+                })
+            ])
+
+        section = re.fullmatch(rf'/library/sections/{SECTION_KEY}/(\w+)', path)
+        if section:
+            return self._section(method, section.group(1), params)
+
+        metadata = re.fullmatch(r'/library/metadata/(\d+)(?:/(\w+))?', path)
+        if metadata:
+            return self._metadata(method, int(metadata.group(1)), metadata.group(2), params)
+        return 404, _element('MediaContainer', {'size': 0})
+
+    def _section(self, method: str, action: str, params: Dict[str, str]) -> Tuple[int, ElementTree.Element]:
+        library = self.server.library
+        libtype = TYPE_NAMES.get(int(params.get('type', 0) or 0), library.libtype)
+        if action == 'all' and method == 'PUT':
+            keys = [int(key) for key in params.get('id', '').split(',') if key]
+            if 'label[].tag.tag-' in params:
+                library.edit_labels(keys, remove=[unquote(tag) for tag in params['label[].tag.tag-'].split(',')])
+            else:
+                tags = [unquote(value) for key, value in sorted(params.items()) if re.fullmatch(r'label\[\d+\]\.tag\.tag', key)]
+                library.edit_labels(keys, labels=tags)
+            return 200, _element('MediaContainer', {'size': 0})
+        if action == 'all':
+            if params.get('includeMeta') == '1':
+                return 200, self._filter_meta()
+            filters = {key: value for key, value in params.items() if key in ('label', 'label!', 'addedAt>>', 'updatedAt>>')}
+            keys = library.query(libtype, filters, params.get('sort'))
+            start = int(params.get('X-Plex-Container-Start', self.headers.get('X-Plex-Container-Start', 0)))
+            size = int(params.get('X-Plex-Container-Size', self.headers.get('X-Plex-Container-Size', len(keys))))
+            page = keys[start:start + size]
+            return 200, _element('MediaContainer', {'size': len(page), 'totalSize': len(keys), 'offset': start,
+                                                    'librarySectionID': SECTION_KEY},
+                                 [self._item_element(key) for key in page])
+        if action == 'label':
+            return 200, _element('MediaContainer', {'size': len(LABELS)}, [
+                _element('Directory', {'key': LABEL_IDS[label], 'title': label, 'type': 'label',
+                                       'fastKey': f"/library/sections/{SECTION_KEY}/all?label={LABEL_IDS[label]}"})
+                for label in LABELS
+            ])
+        if action == 'collections':
+            return 200, _element('MediaContainer', {'size': 0}, [_element('Meta', {})])
+        if action in ('refresh', 'emptyTrash'):
+            return 200, _element('MediaContainer', {'size': 0})
+        return 404, _element('MediaContainer', {'size': 0})
+
+    def _metadata(self, method: str, key: int, action: Optional[str], params: Dict[str, str]) -> Tuple[int, ElementTree.Element]:
+        library = self.server.library
+        if not library.exists(key):
+            return 404, _element('MediaContainer', {'size': 0})
+        if action is None and method == 'DELETE':
+            library.delete(key)
+            return 200, _element('MediaContainer', {'size': 0})
+        if action is None:
+            return 200, _element('MediaContainer', {'size': 1, 'librarySectionID': SECTION_KEY}, [self._item_element(key)])
+        if action == 'posters':
+            default = library.default_poster_selected(key)
+            return 200, _element('MediaContainer', {'size': 2}, [
+                _element('Photo', {
+                    'key': f"/library/metadata/{key}/file?url=upload%3A%2F%2Fposters%2F{key}-{index}",
+                    'ratingKey': f"upload://posters/{key}-{index}",
+                    'selected': int(default == (index == 0)),
+                    'thumb': f"/library/metadata/{key}/file?url=upload%3A%2F%2Fposters%2F{key}-{index}",
+                    'provider': 'local',
+                })
+                for index in range(2)
+            ])
+        if action == 'poster' and method == 'PUT':
+            library.select_poster(key, unquote(params.get('url', '')).endswith('-0'))
+            return 200, _element('MediaContainer', {'size': 0})
+        if action == 'refresh':
+            return 200, _element('MediaContainer', {'size': 0})
+        return 404, _element('MediaContainer', {'size': 0})
+
+    def _item_element(self, key: int) -> ElementTree.Element:
+        library = self.server.library
+        item = library.item(key)
+        children = [_element('Label', {'tag': label, 'id': LABEL_IDS.get(label)}) for label in library.item_labels(key)]
+        if 'duration' in item:
+            children.append(_element('Media', {'id': key, 'duration': item['duration']}, [
+                _element('Part', {'id': key, 'file': f"/media/{item['type']}/{key}.mkv", 'size': 2000000000 + key,
+                                  'duration': item['duration']})
+            ]))
+        tag = 'Video' if item['type'] in ('movie', 'episode') else 'Directory'
+        return _element(tag, item, children)
+
+    def _filter_meta(self) -> ElementTree.Element:
+        types = [
+            _element('Type', {'key': f"/library/sections/{SECTION_KEY}/all?type={TYPE_IDS[level.libtype]}",
+                              'type': level.libtype, 'title': level.libtype.title(), 'active': 0}, [
+                _element('Filter', {'filter': 'label', 'filterType': 'string', 'title': 'Labels', 'type': 'filter',
+                                    'key': f"/library/sections/{SECTION_KEY}/label?type={TYPE_IDS[level.libtype]}"}),
+                _element('Field', {'key': 'label', 'title': 'Label', 'type': 'tag'}),
+                _element('Field', {'key': 'addedAt', 'title': 'Date Added', 'type': 'date'}),
+                _element('Sort', {'key': 'addedAt', 'title': 'Date Added', 'defaultDirection': 'desc',
+                                  'descKey': 'addedAt:desc'}),
+            ])
+            for level in self.server.library.levels
+        ]
+        field_types = [
+            _element('FieldType', {'type': 'tag'}, [
+                _element('Operator', {'key': '=', 'title': 'is'}),
+                _element('Operator', {'key': '!=', 'title': 'is not'}),
+            ]),
+            _element('FieldType', {'type': 'date'}, [
+                _element('Operator', {'key': '>>=', 'title': 'is after'}),
+                _element('Operator', {'key': '<<=', 'title': 'is before'}),
+            ]),
+        ]
+        return _element('MediaContainer', {'size': 0}, [_element('Meta', {}, types + field_types)])
+
+    def _send_container(self, status: int, container: ElementTree.Element) -> None:
+        if 'json' in self.headers.get('Accept', ''):
+            self._send(status, json.dumps({'MediaContainer': self._to_json(container)}).encode(), 'application/json')
+        else:
+            self._send(status, ElementTree.tostring(container, encoding='utf-8'), 'text/xml;charset=utf-8')
+
+    def _to_json(self, element: ElementTree.Element) -> Dict[str, Any]:
+        data: Dict[str, Any] = {key: _json_value(value) for key, value in element.attrib.items()}
+        for child in element:
+            # Plex's JSON groups listed items under Metadata and keeps the tag name for the rest
+            group = 'Metadata' if child.tag in ('Video', 'Directory', 'Photo') and element.tag == 'MediaContainer' else child.tag
+            data.setdefault(group, []).append(self._to_json(child))
+        return data
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def _json_value(value: str) -> Any:
+    if value.isdigit() and not value.startswith('0') or value == '0':
+        return int(value)
+    return value
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a synthetic Plex library for benchmarks")
+    parser.add_argument('--items', type=int, default=1000, help="Movies, or episodes for a TV section")
+    parser.add_argument('--libtype', choices=['movie', 'show'], default='movie')
+    parser.add_argument('--port', type=int, default=32400, help="0 picks a free port")
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    args = parser.parse_args()
+
+    server = FakePlexServer(('127.0.0.1', args.port), args.items, args.libtype,
+                            args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f"Listening on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
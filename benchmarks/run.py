@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Any, Dict, List
+
+OPERATIONS = ('cleanup_labels', 'reset_posters', 'delete_recent')
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _run_case(url: str, operation: str, concurrency: int, use_async: bool, governed: bool, results) -> None:
+    """Run one operation against the stand-in, in its own process so peak RSS is its own"""
+    from plexapi.server import PlexServer
+    from config.config_manager import DEFAULT_CONFIG
+    from operations.governor import RequestGovernor
+    from operations.operations import cleanup_labels_operation, delete_recent_movies_operation, reset_posters_operation
+
+    plex = PlexServer(url, 'benchmark-token')
+    governor = None
+    if governed:
+        governor = RequestGovernor.from_settings(DEFAULT_CONFIG["processing"]["governor"])
+        governor.install(plex)
+    library = plex.library.sections()[0].title
+
+    if operation == 'cleanup_labels':
+        run = cleanup_labels_operation(plex, library, concurrency, ['overlays'], governor=governor)
+    elif operation == 'reset_posters':
+        run = reset_posters_operation(plex, library, concurrency, use_async=use_async, governor=governor)
+    else:
+        run = delete_recent_movies_operation(plex, library, 48, concurrency, governor=governor, assume_yes=True)
+
+    started = time.monotonic()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        summary = asyncio.run(run) or {}
+    results.put({
+        "seconds": time.monotonic() - started,
+        "items": summary.get('total', 0),
+        "item_errors": summary.get('errors', 0),
+        "peak_rss_mb": _peak_rss_mb(),
+    })
+
+def _bench_request(url: str, path: str) -> Dict[str, Any]:
+    with urllib.request.urlopen(f"{url}{path}") as response:
+        return json.load(response)
+
+def run_benchmarks(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Run every size, operation and concurrency combination and collect the measurements"""
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for size in args.items:
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.fake_plex', '--port', '0', '--items', str(size),
+             '--libtype', args.libtype, '--latency-ms', str(args.latency_ms),
+             '--jitter-ms', str(args.jitter_ms), '--error-rate', str(args.error_rate)],
+            stdout=subprocess.PIPE, text=True
+        )
+        try:
+            url = server.stdout.readline().split()[-1]
+            for operation in args.operations:
+                for concurrency in args.concurrency:
+                    _bench_request(url, f"/__bench__/reset?items={size}")
+                    results = context.Queue()
+                    process = context.Process(
+                        target=_run_case,
+                        args=(url, operation, concurrency, not args.sync, args.governor, results)
+                    )
+                    process.start()
+                    process.join()
+                    if process.exitcode != 0:
+                        print(f"{operation} with {concurrency} workers on {size} items failed", file=sys.stderr)
+                        continue
+                    case = results.get()
+                    server_stats = _bench_request(url, "/__bench__/stats")
+                    items = case["items"]
+                    rows.append({
+                        "items": size,
+                        "operation": operation,
+                        "concurrency": concurrency,
+                        "processed": items,
+                        "seconds": case["seconds"],
+                        "items_per_second": items / case["seconds"] if case["seconds"] else 0.0,
+                        "requests": server_stats["requests"],
+                        "requests_per_item": server_stats["requests"] / items if items else 0.0,
+                        "p50_ms": server_stats["p50_ms"],
+                        "p95_ms": server_stats["p95_ms"],
+                        "injected_errors": server_stats["errors"],
+                        "item_errors": case["item_errors"],
+                        "peak_rss_mb": case["peak_rss_mb"],
+                        "by_route": server_stats["by_route"],
+                    })
+                    _print_row(rows[-1])
+        finally:
+            server.terminate()
+            server.wait()
+    return rows
+
+def _print_row(row: Dict[str, Any]) -> None:
+    print(f"{row['operation']:<15} {row['items']:>8} {row['concurrency']:>6} {row['processed']:>9} "
+          f"{row['items_per_second']:>10.1f} {row['requests_per_item']:>9.2f} {row['p50_ms']:>8.1f} "
+          f"{row['p95_ms']:>8.1f} {row['item_errors']:>7} {row['peak_rss_mb']:>9.1f}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark operations against a local stand-in Plex server")
+    parser.add_argument('--items', type=int, nargs='+', default=[1000], help="Library sizes to generate")
+    parser.add_argument('--libtype', choices=['movie', 'show'], default='movie')
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS, default=['cleanup_labels', 'reset_posters'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help="Worker counts to compare")
+    parser.add_argument('--latency-ms', type=float, default=20, help="Latency added to every request")
+    parser.add_argument('--jitter-ms', type=float, default=5, help="Random spread around the latency")
+    parser.add_argument('--error-rate', type=float, default=0, help="Fraction of requests answered with a 503")
+    parser.add_argument('--sync', action='store_true', help="Use the thread pool path for poster resets")
+    parser.add_argument('--governor', action='store_true', help="Route requests through the default request governor")
+    parser.add_argument('--json', dest='json_path', metavar='PATH', help="Also write the results to a JSON file")
+    args = parser.parse_args()
+
+    print(f"{'operation':<15} {'items':>8} {'conc':>6} {'processed':>9} {'items/s':>10} {'req/item':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'peak MB':>9}")
+    rows = run_benchmarks(args)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(rows, f, indent=4)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
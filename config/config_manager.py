@@ -1,7 +1,8 @@
+import copy
 import json
 import os
-from typing import Dict, Any
-from plexapi.server import PlexServer
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator
 
 CONFIG_FILE = "config.json"
 
@@ -12,50 +13,143 @@ DEFAULT_CONFIG = {
     },
     "processing": {
         "mode": "medium",
+        "async_http": True,
         "workers": {
             "light": 1,
             "medium": 2,
             "heavy": 4
+        },
+        "adaptive": {
+            "enabled": True,
+            "ceilings": {
+                "light": 2,
+                "medium": 8,
+                "heavy": 16
+            },
+            "target_p95_ms": 1500,
+            "max_error_rate": 0.05
+        },
+        "load": {
+            "enabled": True,
+            "poll_interval": 15,
+            "throttle_sessions": 1,
+            "pause_sessions": 5,
+            "pause_transcodes": 2,
+            "throttled_workers": 1
+        },
+        "governor": {
+            "enabled": True,
+            "requests_per_second": 0,
+            "burst": 40,
+            "max_retries": 3,
+            "backoff_base": 0.5,
+            "backoff_max": 10,
+            "breaker_threshold": 10,
+            "breaker_cooldown": 30
         }
     },
     "libraries": [],
     "preserve_labels": ["overlays"],
+    "snapshot": {
+        "enabled": True
+    },
+    "tv_hierarchy": {
+        "enabled": False
+    },
+    "path_mappings": {},
+    "diagnostics": {
+        "metrics": True,
+        "textfile_dir": "",
+        "profile": False
+    },
+    "schedule": {
+        "check_interval": 60,
+        "windows": [],
+        "jobs": []
+    },
     "initialized": False
 }
 
 class ConfigManager:
     def __init__(self):
         self.config = self.load_config()
+        self._batching = 0
+        self._unsaved = False
 
     def load_config(self) -> Dict[str, Any]:
         """Load configuration from file or create default"""
         if os.path.exists(CONFIG_FILE):
             try:
                 with open(CONFIG_FILE, 'r') as f:
-                    return json.load(f)
+                    return self._merge_defaults(DEFAULT_CONFIG, json.load(f))
             except json.JSONDecodeError:
                 print("Error reading config file. Using default configuration.")
-                return DEFAULT_CONFIG.copy()
-        return DEFAULT_CONFIG.copy()
+                return copy.deepcopy(DEFAULT_CONFIG)
+        return copy.deepcopy(DEFAULT_CONFIG)
+
+    @staticmethod
+    def _merge_defaults(defaults: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in settings missing from an older config file"""
+        merged = copy.deepcopy(defaults)
+        for key, value in config.items():
+            if isinstance(value, dict) and isinstance(merged.get(key), dict):
+                merged[key] = ConfigManager._merge_defaults(merged[key], value)
+            else:
+                merged[key] = value
+        return merged
 
     def save_config(self) -> None:
-        """Save current configuration to file"""
-        with open(CONFIG_FILE, 'w') as f:
+        """Save current configuration to file, replacing it in one step"""
+        temp_file = f"{CONFIG_FILE}.tmp"
+        with open(temp_file, 'w') as f:
             json.dump(self.config, f, indent=4)
+        os.replace(temp_file, CONFIG_FILE)
+        self._unsaved = False
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Collect the updates made in the block and save them in one write when it completes
+
+        If the block raises, nothing is saved, so an abandoned setup leaves
+        the file as it was.
+        """
+        self._batching += 1
+        try:
+            yield
+        finally:
+            self._batching -= 1
+        if not self._batching and self._unsaved:
+            self.save_config()
 
     def get_worker_count(self) -> int:
         """Get number of workers based on processing mode"""
         mode = self.config["processing"]["mode"]
         return self.config["processing"]["workers"][mode]
 
-    async def test_connection(self, url: str, token: str) -> bool:
-        """Test Plex server connection"""
-        try:
-            PlexServer(url, token)
-            return True
-        except Exception as e:
-            print(f"Connection test failed: {e}")
-            return False
+    def get_concurrency_settings(self) -> Dict[str, Any]:
+        """Get adaptive concurrency settings for the current processing mode"""
+        mode = self.config["processing"]["mode"]
+        adaptive = self.config["processing"]["adaptive"]
+        start = self.get_worker_count()
+        return {
+            "enabled": adaptive["enabled"],
+            "start": start,
+            "ceiling": max(start, adaptive["ceilings"].get(mode, start)),
+            "target_p95_ms": adaptive["target_p95_ms"],
+            "max_error_rate": adaptive["max_error_rate"]
+        }
+
+    def get_governor_settings(self) -> Dict[str, Any]:
+        """Get request rate limit, retry and circuit breaker settings"""
+        return dict(self.config["processing"]["governor"])
+
+    def use_async_http(self) -> bool:
+        """Check if operations should use the asyncio HTTP engine when available"""
+        return self.config["processing"]["async_http"]
+
+    def get_load_settings(self) -> Dict[str, Any]:
+        """Get server load thresholds for throttling and pausing work"""
+        return dict(self.config["processing"]["load"])
 
     def needs_setup(self) -> bool:
         """Check if initial setup is needed"""
@@ -69,6 +163,26 @@ class ConfigManager:
         """Get labels to preserve during cleanup"""
         return self.config.get("preserve_labels", ["overlays"])
 
+    def get_path_mappings(self) -> Dict[str, str]:
+        """Get server-to-local media path prefix mappings"""
+        return self.config.get("path_mappings", {})
+
+    def use_snapshot(self) -> bool:
+        """Check if operations should plan against the local metadata snapshot"""
+        return self.config["snapshot"]["enabled"]
+
+    def get_diagnostics_settings(self) -> Dict[str, Any]:
+        """Get request metrics export and profiling settings"""
+        return dict(self.config["diagnostics"])
+
+    def get_schedule(self) -> Dict[str, Any]:
+        """Get off-peak windows and per-library jobs for the scheduler"""
+        return self.config["schedule"]
+
+    def use_tv_hierarchy(self) -> bool:
+        """Check if TV operations should also process seasons and episodes"""
+        return self.config["tv_hierarchy"]["enabled"]
+
     def update_config(self, key: str, value: Any) -> None:
         """Update a specific configuration value"""
         keys = key.split('.')
@@ -78,4 +192,7 @@ class ConfigManager:
                 current[k] = {}
             current = current[k]
         current[keys[-1]] = value
-        self.save_config()
\ No newline at end of file
+        if self._batching:
+            self._unsaved = True
+        else:
+            self.save_config()
\ No newline at end of file
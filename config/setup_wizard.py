@@ -1,30 +1,37 @@
 from typing import Dict, Any
-from plexapi.server import PlexServer
 import inquirer
 from config.config_manager import ConfigManager
+from utils.session import PlexSession
 
 class SetupWizard:
-    def __init__(self, config_manager: ConfigManager):
+    def __init__(self, config_manager: ConfigManager, session: PlexSession):
         self.config_manager = config_manager
+        self.session = session
 
     async def run_setup(self) -> None:
-        """Run the setup wizard"""
+        """Run the setup wizard
+
+        The connection tested in the first step is kept in the session and
+        used to list libraries. Answers are saved together once the wizard
+        completes.
+        """
         print("\n=== Plex Maintenance Tool Setup ===\n")
         
-        # Get Plex connection details
-        await self._setup_plex_connection()
-        
-        # Get available libraries
-        await self._setup_libraries()
-        
-        # Configure processing mode
-        await self._setup_processing_mode()
-        
-        # Configure label preservation
-        await self._setup_preserve_labels()
-        
-        # Mark setup as complete
-        self.config_manager.update_config("initialized", True)
+        with self.config_manager.batch():
+            # Get Plex connection details
+            await self._setup_plex_connection()
+            
+            # Get available libraries
+            await self._setup_libraries()
+            
+            # Configure processing mode
+            await self._setup_processing_mode()
+            
+            # Configure label preservation
+            await self._setup_preserve_labels()
+            
+            # Mark setup as complete
+            self.config_manager.update_config("initialized", True)
         print("\nSetup complete! Configuration saved.")
 
     async def _setup_plex_connection(self) -> None:
@@ -45,8 +52,8 @@ class SetupWizard:
         answers = inquirer.prompt(questions)
         
         print("\nTesting connection...")
-        if await self.config_manager.test_connection(answers['url'], answers['token']):
-            print("Connection successful!")
+        if self.session.connect(answers['url'], answers['token']):
+            print(f"Connection successful! (Plex {self.session.identity()['version']})")
             self.config_manager.update_config("plex.url", answers['url'])
             self.config_manager.update_config("plex.token", answers['token'])
         else:
@@ -66,12 +73,7 @@ class SetupWizard:
         change_libraries_answer = inquirer.prompt(change_libraries_question)
 
         if change_libraries_answer['change_libraries']:
-            plex = PlexServer(
-                self.config_manager.config["plex"]["url"],
-                self.config_manager.config["plex"]["token"]
-            )
-            
-            available_libraries = [lib.title for lib in plex.library.sections()]
+            available_libraries = [section.title for section in self.session.sections()]
 
             questions = [
                 inquirer.Checkbox('libraries',
@@ -93,9 +95,9 @@ class SetupWizard:
             inquirer.List('mode',
                 message="Select processing mode (affects server load)",
                 choices=[
-                    ('Light (1 worker - Minimal server impact)', 'light'),
-                    ('Medium (2 workers - Balanced)', 'medium'),
-                    ('Heavy (4 workers - Fastest, highest server load)', 'heavy')
+                    ('Light (starts at 1 worker, up to 2 - Minimal server impact)', 'light'),
+                    ('Medium (starts at 2 workers, up to 8 - Balanced)', 'medium'),
+                    ('Heavy (starts at 4 workers, up to 16 - Fastest, highest server load)', 'heavy')
                 ],
                 default=current_mode)
         ]
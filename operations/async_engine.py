@@ -0,0 +1,169 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from plexapi.utils import searchType
+from operations.governor import track_waits
+from operations.streaming import PAGE_SIZE
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+_DONE = object()
+
+def async_available() -> bool:
+    """Check whether the asyncio HTTP engine can be used"""
+    return aiohttp is not None
+
+class AsyncPlexClient:
+    """Plex API client issuing requests over one shared keep-alive connection pool
+
+    The pool holds at most ``concurrency`` connections and a semaphore of the
+    same size bounds requests in flight, so many lightweight tasks can share a
+    handful of connections without an OS thread each. Responses are requested
+    as JSON and the MediaContainer is returned.
+    """
+
+    def __init__(self, baseurl: str, token: str, concurrency: int, timeout: float = 30, governor=None, metrics=None):
+        self.baseurl = baseurl.rstrip('/')
+        self.token = token
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.governor = governor
+        self.metrics = metrics
+        self.session = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_server(cls, plex, concurrency: int, governor=None, metrics=None) -> "AsyncPlexClient":
+        """Create a client for the same server and token as a PlexServer"""
+        return cls(plex._baseurl, plex._token, concurrency, governor=governor, metrics=metrics)
+
+    async def __aenter__(self) -> "AsyncPlexClient":
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers={'X-Plex-Token': self.token, 'Accept': 'application/json'},
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.session.close()
+
+    async def request(self, method: str, path: str, **params) -> Dict[str, Any]:
+        """Send a request and return the response's MediaContainer"""
+        if self.governor:
+            return await self.governor.call_async(
+                lambda: self._send(method, path, params),
+                idempotent=method != 'POST'
+            )
+        return await self._send(method, path, params)
+
+    async def _send(self, method: str, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._semaphore:
+            if self.metrics:
+                with self.metrics.timed(method, path):
+                    return await self._fetch(method, path, params)
+            return await self._fetch(method, path, params)
+
+    async def _fetch(self, method: str, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        async with self.session.request(method, f"{self.baseurl}{path}", params=params) as response:
+            response.raise_for_status()
+            if response.content_length == 0 or 'json' not in response.content_type:
+                return {}
+            data = await response.json()
+            return data.get('MediaContainer', {})
+
+    async def get(self, path: str, **params) -> Dict[str, Any]:
+        return await self.request('GET', path, **params)
+
+    async def put(self, path: str, **params) -> Dict[str, Any]:
+        return await self.request('PUT', path, **params)
+
+async def iter_section_items_async(client: AsyncPlexClient, library, libtype: Optional[str] = None,
+                                   page_size: int = PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+    """Yield a library section's items as JSON metadata, one page at a time"""
+    start = 0
+    while True:
+        container = await client.get(
+            f"/library/sections/{library.key}/all",
+            **{
+                'type': searchType(libtype or library.TYPE),
+                'X-Plex-Container-Start': start,
+                'X-Plex-Container-Size': page_size,
+            }
+        )
+        page = container.get('Metadata', [])
+        for item in page:
+            yield item
+        if len(page) < page_size:
+            break
+        start += page_size
+
+async def stream_process_async(items: AsyncIterator[Any],
+                               process_item: Callable[[Any, int], Awaitable[Dict[str, int]]],
+                               controller) -> AsyncIterator[Dict[str, int]]:
+    """Process items on asyncio tasks while the item source is still being read
+
+    The asyncio counterpart of ``stream_process``: a feeder task fills a
+    bounded queue and one task per slot up to the controller's ceiling
+    consumes it. A task only starts an item once it gets one of the
+    controller's worker slots, and each item's latency, less any wait for
+    the request governor, is fed back to the controller.
+    """
+    worker_count = controller.ceiling
+    work = asyncio.Queue(maxsize=worker_count * 4)
+    results = asyncio.Queue()
+
+    async def feed():
+        try:
+            index = 0
+            async for item in items:
+                index += 1
+                await work.put((index, item))
+        except Exception as e:
+            await results.put(e)
+        finally:
+            for _ in range(worker_count):
+                await work.put(_DONE)
+
+    async def work_loop():
+        while True:
+            entry = await work.get()
+            if entry is _DONE:
+                break
+            await controller.acquire_async()
+            index, item = entry
+            started = time.monotonic()
+            waits = track_waits()
+            result = None
+            try:
+                result = await process_item(item, index)
+                await results.put(result)
+            except Exception as e:
+                await results.put(e)
+            finally:
+                failed = result is None or bool(result.get("errors"))
+                controller.release(max(0.0, time.monotonic() - started - waits[0]), failed)
+        await results.put(_DONE)
+
+    tasks = [asyncio.create_task(feed())]
+    tasks += [asyncio.create_task(work_loop()) for _ in range(worker_count)]
+
+    finished = 0
+    try:
+        while finished < worker_count:
+            result = await results.get()
+            if result is _DONE:
+                finished += 1
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
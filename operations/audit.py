@@ -0,0 +1,148 @@
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from plexapi.utils import joinArgs, searchType
+from operations.streaming import iter_section_query, stream_process
+
+AUDIT_CACHE_SECONDS = 600
+
+class AuditRule:
+    """A single metadata check run against every item in the audit pass
+
+    check returns None when the item passes, or a dict describing the problem.
+    Rules that need fields missing from the section listing set needs_detail;
+    items they flag are reloaded once and the rule is re-checked on full
+    metadata before the finding is kept.
+    """
+
+    def __init__(self, name: str, category: str, check: Callable[[Any], Optional[Dict[str, Any]]],
+                 needs_detail: bool = False):
+        self.name = name
+        self.category = category
+        self.check = check
+        self.needs_detail = needs_detail
+
+def _missing(attr: str) -> Callable[[Any], Optional[Dict[str, Any]]]:
+    return lambda item: None if getattr(item, attr, None) else {}
+
+def _added_before_release(item) -> Optional[Dict[str, Any]]:
+    released = item.originallyAvailableAt
+    if item.addedAt and released and item.addedAt.date() < released.date():
+        return {"issue": "Added before its release date", "added": item.addedAt.date(), "released": released.date()}
+    return None
+
+def _year_mismatch(item) -> Optional[Dict[str, Any]]:
+    released = item.originallyAvailableAt
+    if released and item.year and released.year != item.year:
+        return {"issue": "Year does not match release date", "year": item.year, "released": released.date()}
+    return None
+
+def _future_release(item) -> Optional[Dict[str, Any]]:
+    released = item.originallyAvailableAt
+    if released and released > datetime.now():
+        return {"issue": "Release date is in the future", "released": released.date()}
+    return None
+
+RULES = [
+    AuditRule('summary', 'metadata', _missing('summary')),
+    AuditRule('poster', 'metadata', _missing('thumb')),
+    AuditRule('year', 'metadata', _missing('year')),
+    AuditRule('release date', 'metadata', _missing('originallyAvailableAt')),
+    # Listings only carry a few tags per item, so confirm missing genres on full metadata
+    AuditRule('genres', 'metadata', _missing('genres'), needs_detail=True),
+    AuditRule('added before release', 'dates', _added_before_release),
+    AuditRule('year mismatch', 'dates', _year_mismatch),
+    AuditRule('future release', 'dates', _future_release),
+]
+
+Finding = Tuple[Any, List[Tuple[AuditRule, Dict[str, Any]]]]
+
+class _AuditPass:
+    """Findings of one audit pass and what they are still valid for"""
+
+    def __init__(self, fingerprint: Tuple[int, Optional[str]], findings: List[Finding]):
+        self.created_at = time.monotonic()
+        self.fingerprint = fingerprint
+        self.findings = findings
+        self.used_by: Set[str] = set()
+
+_cache: Dict[Tuple[str, Any], _AuditPass] = {}
+
+def _fingerprint(library) -> Tuple[int, Optional[str]]:
+    """Item count and newest updatedAt of a section, which change with any edit, addition or removal"""
+    args = {
+        'type': searchType(library.TYPE),
+        'sort': 'updatedAt:desc',
+        'X-Plex-Container-Start': 0,
+        'X-Plex-Container-Size': 1,
+    }
+    data = library._server.query(f"/library/sections/{library.key}/all{joinArgs(args)}")
+    newest = next(iter(data), None)
+    count = int(data.attrib.get('totalSize', data.attrib.get('size', 0)))
+    return count, newest.get('updatedAt') if newest is not None else None
+
+def _check(item, rules: List[AuditRule]) -> List[Tuple[AuditRule, Dict[str, Any]]]:
+    found = []
+    for rule in rules:
+        details = rule.check(item)
+        if details is not None:
+            found.append((rule, details))
+    return found
+
+def audit_library(library, worker_count: int, rules: List[AuditRule] = RULES,
+                  check: Optional[str] = None) -> List[Finding]:
+    """Run every audit rule over a library in one pass
+
+    Items are read from one paged section listing and checked against all
+    rules at once. Only items flagged by a detail rule are reloaded, using
+    the worker threads.
+
+    Results are kept for a few minutes, keyed by server and section, so the
+    other check named by check (e.g. release dates after metadata
+    completeness) reuses the pass instead of walking the library again. A
+    pass is not reused by the check that already read it, so rerunning a
+    check always audits afresh, nor once the section's item count or newest
+    updatedAt has changed.
+    """
+    key = (library._server.machineIdentifier, library.key)
+    fingerprint = _fingerprint(library) if rules is RULES else None
+    cached = _cache.get(key) if check else None
+    if (cached and check not in cached.used_by and cached.fingerprint == fingerprint
+            and time.monotonic() - cached.created_at < AUDIT_CACHE_SECONDS):
+        print("Reusing recent audit of this library")
+        cached.used_by.add(check)
+        return cached.findings
+
+    findings: List[Finding] = []
+    suspects: List[Finding] = []
+    for item in iter_section_query(library):
+        found = _check(item, rules)
+        if any(rule.needs_detail for rule, _ in found):
+            suspects.append((item, found))
+        elif found:
+            findings.append((item, found))
+
+    if suspects:
+        print(f"Loading full metadata for {len(suspects)} items...")
+
+        def confirm(entry, index):
+            item, found = entry
+            try:
+                item.reload()
+            except Exception as e:
+                print(f"\nCould not load full metadata for {item.title}: {e}")
+                return {"item": item, "found": found}
+            detail_rules = [rule for rule, _ in found if rule.needs_detail]
+            confirmed = [finding for finding in found if not finding[0].needs_detail]
+            confirmed += _check(item, detail_rules)
+            return {"item": item, "found": confirmed}
+
+        for result in stream_process(suspects, confirm, worker_count):
+            if result["found"]:
+                findings.append((result["item"], result["found"]))
+
+    if rules is RULES:
+        _cache[key] = _AuditPass(fingerprint, findings)
+        if check:
+            _cache[key].used_by.add(check)
+    return findings
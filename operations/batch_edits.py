@@ -0,0 +1,106 @@
+import threading
+from collections import defaultdict
+from typing import Any, Callable, List, Optional, Tuple
+from urllib.parse import quote
+from plexapi.utils import joinArgs, searchType
+
+BATCH_SIZE = 100
+
+def _multi_edit(library, libtype: str, rating_keys: List[Any], edits: dict) -> None:
+    args = {
+        'type': searchType(libtype),
+        'id': ','.join(str(key) for key in rating_keys),
+        'label.locked': 1,
+    }
+    args.update(edits)
+    server = library._server
+    server.query(f"/library/sections/{library.key}/all{joinArgs(args)}", method=server._session.put)
+
+def remove_label_from_items(library, libtype: str, rating_keys: List[Any], tag: str) -> None:
+    """Remove a label from many items in one section-level multi-edit request"""
+    _multi_edit(library, libtype, rating_keys, {'label[].tag.tag-': quote(tag)})
+
+def set_labels_on_items(library, libtype: str, rating_keys: List[Any], tags: Tuple[str, ...]) -> None:
+    """Set the full label list of many items in one section-level multi-edit request"""
+    _multi_edit(library, libtype, rating_keys, {f'label[{i}].tag.tag': tag for i, tag in enumerate(tags)})
+
+class LabelBatcher:
+    """Group label edits and send them as multi-item edits
+
+    Removals of the same tag from items of the same type are collected until a
+    batch is full and then sent as a single request. Additions are grouped by
+    the item's resulting label list, so a batch always sets the exact same
+    labels on every item in it and never drops labels an item already had.
+    If a batch request fails, its items fall back to one call each.
+    on_result, if given, is called with (item, tag, error) for every item.
+    """
+
+    def __init__(self, library, stats, batch_size: int = BATCH_SIZE,
+                 on_result: Optional[Callable[[Any, str, Optional[Exception]], None]] = None):
+        self.library = library
+        self.stats = stats
+        self.batch_size = batch_size
+        self.on_result = on_result
+        self._pending = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def remove(self, item, tag: str) -> None:
+        """Queue a label removal, sending the batch once it is full"""
+        self._queue(('remove', item.type, tag), item, tag)
+
+    def add(self, item, tag: str) -> None:
+        """Queue a label addition, sending the batch once it is full"""
+        labels = tuple(sorted({label.tag for label in item.labels} | {tag}))
+        self._queue(('add', item.type, labels), item, tag)
+
+    def flush(self) -> None:
+        """Send every partially filled batch"""
+        with self._lock:
+            pending = list(self._pending.items())
+            self._pending.clear()
+        for key, batch in pending:
+            self._send(key, batch)
+
+    def _queue(self, key, item, tag: str) -> None:
+        with self._lock:
+            batch = self._pending[key]
+            batch.append((item, tag))
+            if len(batch) < self.batch_size:
+                return
+            del self._pending[key]
+        self._send(key, batch)
+
+    def _send(self, key, batch) -> None:
+        action, libtype, tags = key
+        counter = "removed" if action == 'remove' else "labeled"
+        keys = [item.ratingKey for item, _ in batch]
+        try:
+            if action == 'remove':
+                remove_label_from_items(self.library, libtype, keys, tags)
+            else:
+                set_labels_on_items(self.library, libtype, keys, tags)
+            self.stats.update(**{counter: len(batch), "batch_requests": 1})
+            self._report(batch, None)
+        except Exception as e:
+            self.stats.message(f"Batch label {action} failed, retrying per item: {e}")
+            self.stats.update(batch_failures=1)
+            for item, tag in batch:
+                try:
+                    if not hasattr(item, 'removeLabel'):
+                        # A listing, snapshot or plan record, fetch the real item
+                        item = self.library.fetchItem(item.ratingKey)
+                    if action == 'remove':
+                        item.removeLabel(tag)
+                    else:
+                        item.addLabel(tag)
+                    self.stats.update(**{counter: 1, "fallback_requests": 1})
+                    self._report([(item, tag)], None)
+                except Exception as item_error:
+                    self.stats.log_error(item.title, f"Failed to {action} label '{tag}': {item_error}")
+                    self.stats.update(errors=1)
+                    self._report([(item, tag)], item_error)
+
+    def _report(self, batch, error: Optional[Exception]) -> None:
+        if self.on_result:
+            for item, tag in batch:
+                self.on_result(item, tag, error)
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+class AdaptiveConcurrencyController:
+    """Adjust the number of active workers with additive increase, multiplicative decrease
+
+    Workers acquire a slot before each item and release it with the item's
+    latency and error flag. Threads wait for a slot with acquire and asyncio
+    tasks with acquire_async; both are woken when a slot frees up or a cap
+    changes, whichever thread or event loop that happens on. After every
+    window of samples the controller grows the limit by one while p95 latency
+    and error rate stay under their targets, and cuts it by the backoff
+    factor when either target is missed.
+    """
+
+    def __init__(self, start: int, ceiling: int, target_p95_ms: float = 1500,
+                 max_error_rate: float = 0.05, window: int = 20, backoff: float = 0.5):
+        self.ceiling = max(1, ceiling)
+        self.limit = min(max(1, start), self.ceiling)
+        self.target_p95 = target_p95_ms / 1000
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.backoff = backoff
+        self.last_p95 = 0.0
+        self.caps: Dict[str, int] = {}
+        self._active = 0
+        self._samples: List[Tuple[float, bool]] = []
+        self._cond = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @classmethod
+    def fixed(cls, worker_count: int) -> "AdaptiveConcurrencyController":
+        """Create a controller that never changes its limit"""
+        controller = cls(worker_count, worker_count)
+        controller.window = 0
+        return controller
+
+    @property
+    def cap(self) -> Optional[int]:
+        """Lowest cap set from outside the controller, or None"""
+        # Other threads read this while set_cap changes the caps
+        with self._cond:
+            return min(self.caps.values()) if self.caps else None
+
+    @property
+    def workers(self) -> int:
+        """Number of workers currently allowed to run"""
+        with self._cond:
+            cap = self.cap
+            return self.limit if cap is None else min(self.limit, cap)
+
+    def set_cap(self, cap: Optional[int], source: str = "load") -> None:
+        """Cap the limit from outside the controller, 0 pauses all workers
+
+        Each source (server load, schedule window) keeps its own cap and the
+        lowest one applies. None lifts the source's cap.
+        """
+        with self._cond:
+            if cap is None:
+                self.caps.pop(source, None)
+            else:
+                self.caps[source] = cap
+            self._notify()
+
+    def acquire(self, cancelled: Optional[threading.Event] = None) -> bool:
+        """Wait for a free worker slot, returns False if cancelled while waiting"""
+        with self._cond:
+            while self._active >= self.workers:
+                if cancelled is not None and cancelled.is_set():
+                    return False
+                self._cond.wait(0.5)
+            self._active += 1
+            return True
+
+    async def acquire_async(self) -> None:
+        """Wait for a free worker slot without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._active < self.workers:
+                    self._active += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._cond:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def release(self, latency: float, error: bool = False) -> None:
+        """Free a worker slot and record how the request went"""
+        with self._cond:
+            self._active -= 1
+            self._record(latency, error)
+            self._notify()
+
+    def _notify(self) -> None:
+        # Called with the lock held; async waiters may sit on other threads' event loops
+        self._cond.notify_all()
+        for loop, waiter in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # The waiter's event loop has already closed
+                pass
+        self._async_waiters = []
+
+    def _record(self, latency: float, error: bool) -> None:
+        if self.window:
+            self._samples.append((latency, error))
+            if len(self._samples) >= self.window:
+                self._adjust()
+
+    def _adjust(self) -> None:
+        latencies = sorted(latency for latency, _ in self._samples)
+        self.last_p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        error_rate = sum(1 for _, error in self._samples if error) / len(self._samples)
+        self._samples = []
+
+        if self.last_p95 > self.target_p95 or error_rate > self.max_error_rate:
+            self.limit = max(1, int(self.limit * self.backoff))
+        elif self.limit < self.ceiling:
+            self.limit += 1
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+def create_controller(worker_count: int, settings: Optional[Dict[str, Any]] = None) -> AdaptiveConcurrencyController:
+    """Build a controller from the processing settings, or a fixed one without them"""
+    if not settings or not settings.get("enabled"):
+        return AdaptiveConcurrencyController.fixed(worker_count)
+    return AdaptiveConcurrencyController(
+        start=settings.get("start", worker_count),
+        ceiling=settings.get("ceiling", worker_count),
+        target_p95_ms=settings.get("target_p95_ms", 1500),
+        max_error_rate=settings.get("max_error_rate", 0.05)
+    )
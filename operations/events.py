@@ -0,0 +1,212 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from queue import Empty, Queue
+from typing import Any, Callable, List, Optional, Tuple
+from utils.utils import format_progress_bar
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+
+REFRESH_PER_SECOND = 4
+QUEUE_SIZE = 10000
+MAX_LOG_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 3
+FSYNC_INTERVAL = 1.0
+
+_CLOSE = object()
+
+_open_buses: List["EventBus"] = []
+_open_lock = threading.Lock()
+
+def notify(text: str) -> None:
+    """Report a notice from a background thread, such as the load monitor's
+
+    Every open bus records it and the first one prints it above its bar.
+    With no bus open it is printed directly.
+    """
+    with _open_lock:
+        buses = list(_open_buses)
+    if not buses:
+        print(f"\n{text}", flush=True)
+        return
+    buses[0].message(text)
+    for bus in buses[1:]:
+        bus.notice(text)
+
+class RotatingJsonlWriter:
+    """Append JSON lines to a file, rotating it to .1, .2, ... once it grows too large"""
+
+    def __init__(self, path: str, max_bytes: int = MAX_LOG_BYTES, backups: int = LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, 'a')
+        self._size = self._file.tell()
+
+    def write(self, lines: List[str]) -> None:
+        for line in lines:
+            if self._size + len(line) > self.max_bytes and self._size:
+                self._rotate()
+            self._file.write(line)
+            self._size += len(line)
+        self._file.flush()
+
+    def sync(self) -> None:
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, 'w')
+        self._size = 0
+
+class EventBus:
+    """Collect events from worker threads and handle them on a single writer thread
+
+    Workers only put small tuples on a bounded queue. The writer thread
+    streams every event to a rotating JSONL log as it arrives, and is the
+    only thread drawing the progress bar. The bar is redrawn at most
+    refresh_per_second times a second, and only when the completed or worker
+    count changed. Messages (errors, notices) are printed above the bar. When
+    the queue is full, workers wait for the writer, so memory stays bounded.
+
+    When stdout is not a terminal (a daemon, or output piped to a log) there
+    is no live bar: messages are printed as plain lines and the bar is
+    printed once when the bus closes.
+    """
+
+    def __init__(self, operation: str, library_name: str, total: int,
+                 workers: Optional[Callable[[], int]] = None,
+                 refresh_per_second: float = REFRESH_PER_SECOND,
+                 directory: str = LOG_DIR,
+                 live: Optional[bool] = None):
+        slug = re.sub(r'[^a-z0-9]+', '-', f"{operation}-{library_name}".lower()).strip('-')
+        self.path = os.path.join(directory, f"events-{slug}.jsonl")
+        self.total = total
+        self.workers = workers
+        self.completed = 0
+        self.refresh_interval = 1 / refresh_per_second
+        self.live = sys.stdout.isatty() if live is None else live
+        self._queue: Queue = Queue(maxsize=QUEUE_SIZE)
+        self._writer = RotatingJsonlWriter(self.path)
+        self._started = time.monotonic()
+        self._drawn_at = 0.0
+        self._drawn_state = None
+        self._bar_width = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._writer.write([json.dumps({
+            "time": time.time(), "event": "start", "operation": operation,
+            "library": library_name, "total": total,
+        }) + "\n"])
+        self._thread.start()
+        with _open_lock:
+            _open_buses.append(self)
+
+    def item(self, title: str, status: str, **fields: Any) -> None:
+        """Record that an item finished, counting it toward progress"""
+        self._queue.put(('item', time.time(), title, status, fields))
+
+    def error(self, title: str, message: str) -> None:
+        """Record an error, printing it above the progress bar"""
+        self._queue.put(('error', time.time(), title, message, None))
+
+    def message(self, text: str) -> None:
+        """Print a notice above the progress bar and record it"""
+        self._queue.put(('message', time.time(), None, text, None))
+
+    def notice(self, text: str) -> None:
+        """Record a notice without printing it"""
+        self._queue.put(('notice', time.time(), None, text, None))
+
+    def close(self) -> None:
+        """Write out every queued event, draw the final bar and stop the writer"""
+        with _open_lock:
+            _open_buses.remove(self)
+        self._queue.put(_CLOSE)
+        self._thread.join()
+
+    def _run(self) -> None:
+        synced_at = time.monotonic()
+        closing = False
+        while not closing:
+            try:
+                events = [self._queue.get(timeout=self.refresh_interval)]
+            except Empty:
+                events = []
+            while len(events) < 1000:
+                try:
+                    events.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            lines = []
+            messages = []
+            for event in events:
+                if event is _CLOSE:
+                    closing = True
+                    continue
+                kind, timestamp, title, text, fields = event
+                record = {"time": timestamp, "event": kind}
+                if kind == 'item':
+                    self.completed += 1
+                    record.update(title=title, status=text, **fields)
+                elif kind == 'error':
+                    record.update(title=title, error=text)
+                    messages.append(f"Error processing {title}: {text}")
+                else:
+                    record.update(message=text)
+                    if kind == 'message':
+                        messages.append(text)
+                lines.append(json.dumps(record, default=str) + "\n")
+            if lines:
+                self._writer.write(lines)
+
+            now = time.monotonic()
+            if now - synced_at >= FSYNC_INTERVAL:
+                self._writer.sync()
+                synced_at = now
+            state = (self.completed, self.workers() if self.workers else None)
+            redraw = self.live and state != self._drawn_state and now - self._drawn_at >= self.refresh_interval
+            if messages or closing or redraw:
+                self._draw(messages, state, final=closing)
+
+        self._writer.write([json.dumps({
+            "time": time.time(), "event": "finish", "completed": self.completed,
+            "seconds": round(time.monotonic() - self._started, 3),
+        }) + "\n"])
+        self._writer.close()
+
+    def _draw(self, messages: List[str], state: Tuple[int, Optional[int]], final: bool = False) -> None:
+        if messages:
+            if self._bar_width:
+                # Messages overwrite the bar, which is drawn again below them
+                print("\r" + " " * self._bar_width + "\r", end="")
+                self._bar_width = 0
+            print("\n".join(messages), flush=True)
+        if self.total and (self.live or final):
+            completed, workers = state
+            elapsed = time.monotonic() - self._started
+            rate = completed / elapsed if elapsed else 0.0
+            remaining = max(self.total - completed, 0)
+            eta = f"{int(remaining / rate // 60)}:{int(remaining / rate % 60):02d}" if rate else "--:--"
+            bar = f"{format_progress_bar(min(completed, self.total), self.total, workers=workers)} {rate:.1f}/s ETA {eta}"
+            if self.live:
+                print(f"\r{bar.ljust(self._bar_width)}", end="\n" if final else "", flush=True)
+                self._bar_width = len(bar)
+            else:
+                print(bar, flush=True)
+        self._drawn_state = state
+        self._drawn_at = time.monotonic()
\ No newline at end of file
@@ -0,0 +1,202 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+from operations.events import notify
+
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+_waits: ContextVar[Optional[List[float]]] = ContextVar('governor_waits', default=None)
+_counts: ContextVar[Optional[Dict[str, int]]] = ContextVar('governor_counts', default=None)
+
+def track_counts() -> Dict[str, int]:
+    """Start counting the requests, retries and breaker trips of the current thread or task
+
+    Returns the running counts. Threads and tasks started from it afterwards
+    with a copy of its context add to the same counts, so each operation
+    sharing a governor with others can report its own.
+    """
+    counts = {"requests": 0, "retries": 0, "breaker_trips": 0}
+    _counts.set(counts)
+    return counts
+
+def track_waits() -> List[float]:
+    """Start totalling the time the current thread or task waits for governor tokens
+
+    Returns a one-element list holding the running total, so callers timing
+    a unit of work can leave the rate limit's waits out of its latency.
+    Tasks started from the current one add to the same total.
+    """
+    waits = [0.0]
+    _waits.set(waits)
+    return waits
+
+def _add_wait(seconds: float) -> None:
+    waits = _waits.get()
+    if waits is not None and seconds:
+        waits[0] += seconds
+
+def is_transient(error: Exception) -> bool:
+    """Check whether a failed request is worth retrying"""
+    if isinstance(error, (RequestsConnectionError, Timeout, ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    # aiohttp response errors carry the status, plexapi's BadRequest puts it in the message
+    status = getattr(error, 'status', None)
+    if status is None:
+        match = re.match(r'\((\d{3})\)', str(error))
+        status = int(match.group(1)) if match else None
+    if status in TRANSIENT_STATUSES:
+        return True
+    return type(error).__module__.startswith('aiohttp') and 'Connection' in type(error).__name__
+
+class RequestGovernor:
+    """Shared limits around every Plex request
+
+    A token bucket caps the request rate across all workers when
+    requests_per_second is set; 0 leaves the rate unlimited. Transient
+    failures of idempotent requests are retried with jittered exponential
+    backoff. When consecutive failures reach the breaker threshold, the
+    circuit opens and every caller waits out the cooldown before dispatching
+    again; the first failure after a cooldown opens it again.
+    """
+
+    def __init__(self, requests_per_second: float = 0, burst: int = 40, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 10,
+                 breaker_threshold: int = 10, breaker_cooldown: float = 30):
+        self.rate = requests_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.counts = {"requests": 0, "retries": 0, "breaker_trips": 0}
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+        self._installed = {}
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "RequestGovernor":
+        """Build a governor from the governor settings"""
+        return cls(**{key: value for key, value in settings.items() if key != "enabled"})
+
+    def install(self, plex) -> None:
+        """Route every query made through a PlexServer, and the items it returns, through the governor"""
+        previous = plex.__dict__.get('query')
+        original = plex.query
+
+        def query(key, method=None, **kwargs):
+            idempotent = method is None or getattr(method, '__name__', '') != 'post'
+            return self.call(original, key, method=method, idempotent=idempotent, **kwargs)
+
+        self._installed[id(plex)] = previous
+        plex.query = query
+
+    def uninstall(self, plex) -> None:
+        """Restore the query method a PlexServer had before install"""
+        if id(plex) not in self._installed:
+            return
+        previous = self._installed.pop(id(plex))
+        if previous is None:
+            del plex.query
+        else:
+            plex.query = previous
+
+    def call(self, func: Callable, *args, idempotent: bool = True, **kwargs) -> Any:
+        """Call func under the rate limit, retrying transient failures"""
+        attempt = 0
+        while True:
+            wait = self._wait_time()
+            _add_wait(wait)
+            time.sleep(wait)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                delay = self._failed(e, attempt, idempotent)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self._succeeded()
+            return result
+
+    async def call_async(self, func: Callable[[], Awaitable[Any]], idempotent: bool = True) -> Any:
+        """Await func() under the rate limit, retrying transient failures"""
+        attempt = 0
+        while True:
+            wait = self._wait_time()
+            _add_wait(wait)
+            await asyncio.sleep(wait)
+            try:
+                result = await func()
+            except Exception as e:
+                delay = self._failed(e, attempt, idempotent)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self._succeeded()
+            return result
+
+    def _wait_time(self) -> float:
+        """Reserve a token and return how long to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._open_until - now)
+            self._count("requests")
+            if self.rate <= 0:
+                return wait
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def _count(self, key: str) -> None:
+        # Called with the lock held
+        self.counts[key] += 1
+        counts = _counts.get()
+        if counts is not None:
+            counts[key] += 1
+
+    def _succeeded(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def _failed(self, error: Exception, attempt: int, idempotent: bool) -> Optional[float]:
+        """Record a failure and return the retry delay, or None to give up"""
+        transient = is_transient(error)
+        tripped = False
+        with self._lock:
+            if transient:
+                self._failures += 1
+                if self._failures >= self.breaker_threshold:
+                    tripped = True
+                    self._count("breaker_trips")
+                    self._open_until = time.monotonic() + self.breaker_cooldown
+                    self._failures = self.breaker_threshold - 1
+            retry = transient and idempotent and attempt < self.max_retries
+            if retry:
+                self._count("retries")
+        if tripped:
+            notify(f"Too many consecutive failures, pausing requests for {self.breaker_cooldown:.0f} seconds")
+        if not retry:
+            return None
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return random.uniform(0, delay)
+
+def create_governor(settings: Optional[Dict[str, Any]]) -> Optional[RequestGovernor]:
+    """Build a governor from the governor settings, or None when it is disabled"""
+    if not settings or not settings.get("enabled"):
+        return None
+    return RequestGovernor.from_settings(settings)
\ No newline at end of file
@@ -0,0 +1,218 @@
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "integrity_cache.json")
+
+MP4_EXTENSIONS = {'.mp4', '.m4v', '.mov'}
+MKV_EXTENSIONS = {'.mkv', '.webm'}
+
+# Matroska element IDs
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMESTAMP_SCALE = 0x2AD7B1
+DURATION = 0x4489
+CUES = 0x1C53BB6B
+CLUSTER = 0x1F43B675
+
+def _read_vint(data, pos: int, keep_marker: bool = False) -> Tuple[int, int, bool]:
+    """Read an EBML variable-length integer, returns (value, length, all_ones)"""
+    first = data[pos]
+    if first == 0:
+        raise ValueError(f"Invalid EBML integer at offset {pos}")
+    length = 9 - first.bit_length()
+    value = first if keep_marker else first & ((1 << (8 - length)) - 1)
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    all_ones = not keep_marker and value == (1 << (7 * length)) - 1
+    return value, length, all_ones
+
+def _read_element(data, pos: int) -> Tuple[int, int, int, bool]:
+    """Read an EBML element header, returns (id, data_start, data_size, unknown_size)"""
+    element_id, id_length, _ = _read_vint(data, pos, keep_marker=True)
+    size, size_length, unknown = _read_vint(data, pos + id_length)
+    return element_id, pos + id_length + size_length, size, unknown
+
+def _children(data, start: int, end: int):
+    """Yield (id, data_start, data_size) for the child elements in a range"""
+    pos = start
+    while pos < end:
+        element_id, data_start, size, _ = _read_element(data, pos)
+        yield element_id, data_start, size
+        pos = data_start + size
+
+def _check_mkv(data, file_size: int) -> Tuple[List[str], Optional[float]]:
+    problems = []
+    element_id, data_start, size, _ = _read_element(data, 0)
+    if element_id != EBML_HEADER:
+        return ["Missing EBML header"], None
+
+    segment_pos = data_start + size
+    if segment_pos >= file_size:
+        return ["File truncated after EBML header"], None
+    element_id, segment_start, segment_size, unknown = _read_element(data, segment_pos)
+    if element_id != SEGMENT:
+        return ["Missing Segment element"], None
+    if not unknown and segment_start + segment_size > file_size:
+        problems.append("File truncated (segment extends past end of file)")
+
+    # Top-level metadata sits before the first cluster, so stop there
+    positions = {}
+    pos = segment_start
+    while pos < file_size:
+        element_id, child_start, child_size, _ = _read_element(data, pos)
+        if element_id == CLUSTER:
+            break
+        positions.setdefault(element_id, pos)
+        if element_id == SEEK_HEAD:
+            for seek_id, seek_start, seek_size in _children(data, child_start, child_start + child_size):
+                if seek_id != SEEK:
+                    continue
+                target_id = target_pos = None
+                for field_id, field_start, field_size in _children(data, seek_start, seek_start + seek_size):
+                    value = int.from_bytes(data[field_start:field_start + field_size], 'big')
+                    if field_id == SEEK_ID:
+                        target_id = value
+                    elif field_id == SEEK_POSITION:
+                        target_pos = value
+                if target_id is not None and target_pos is not None:
+                    positions.setdefault(target_id, segment_start + target_pos)
+        pos = child_start + child_size
+
+    duration = None
+    if INFO in positions:
+        _, info_start, info_size, _ = _read_element(data, positions[INFO])
+        scale, raw_duration = 1000000, None
+        for field_id, field_start, field_size in _children(data, info_start, info_start + info_size):
+            raw = data[field_start:field_start + field_size]
+            if field_id == TIMESTAMP_SCALE:
+                scale = int.from_bytes(raw, 'big')
+            elif field_id == DURATION:
+                raw_duration = struct.unpack('>f' if field_size == 4 else '>d', raw)[0]
+        if raw_duration is not None:
+            duration = raw_duration * scale / 1000000
+    else:
+        problems.append("Missing segment Info element")
+
+    cues_pos = positions.get(CUES)
+    if cues_pos is None:
+        problems.append("No Cues index referenced (seeking will be slow)")
+    elif cues_pos >= file_size:
+        problems.append("Cues index points past end of file")
+    else:
+        element_id, cues_start, cues_size, _ = _read_element(data, cues_pos)
+        if element_id != CUES:
+            problems.append("Cues index position does not hold a Cues element")
+        elif cues_start + cues_size > file_size:
+            problems.append("File truncated inside Cues index")
+    return problems, duration
+
+def _mp4_duration(data, start: int, end: int) -> Optional[float]:
+    pos = start
+    while pos + 8 <= end:
+        size = int.from_bytes(data[pos:pos + 4], 'big')
+        if data[pos + 4:pos + 8] == b'mvhd':
+            offset, layout = (28, '>IQ') if pos + 8 < end and data[pos + 8] == 1 else (20, '>II')
+            if pos + offset + struct.calcsize(layout) > end:
+                # Header cut off by truncation, reported by the caller
+                return None
+            timescale, duration = struct.unpack_from(layout, data, pos + offset)
+            return duration * 1000 / timescale if timescale else None
+        if size < 8:
+            break
+        pos += size
+    return None
+
+def _check_mp4(data, file_size: int) -> Tuple[List[str], Optional[float]]:
+    problems = []
+    seen = set()
+    duration = None
+    pos = 0
+    while pos + 8 <= file_size:
+        size = int.from_bytes(data[pos:pos + 4], 'big')
+        box_type = data[pos + 4:pos + 8].decode('latin-1')
+        header = 8
+        if size == 1:
+            size = int.from_bytes(data[pos + 8:pos + 16], 'big')
+            header = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header or not box_type.isprintable():
+            problems.append(f"Corrupt atom header at offset {pos}")
+            break
+        seen.add(box_type)
+        if pos + size > file_size:
+            problems.append(f"File truncated inside '{box_type}' atom")
+        if box_type == 'moov':
+            duration = _mp4_duration(data, pos + header, min(pos + size, file_size))
+        pos += size
+
+    if 'ftyp' not in seen:
+        problems.append("Missing ftyp atom")
+    if 'moov' not in seen:
+        problems.append("Missing moov atom")
+    if 'mdat' not in seen:
+        problems.append("Missing mdat atom")
+    return problems, duration
+
+def check_container(path: str) -> Dict[str, Any]:
+    """Check a media file's container structure, reading only the pages it touches
+
+    Runs in a worker process. Returns the structural problems found and the
+    duration in milliseconds recorded in the container, if any. Files that
+    cannot be opened or read are reported as a problem and marked unreadable,
+    so the result is not cached.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        with open(path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if not file_size:
+                return {"problems": ["File is empty"], "duration": None}
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if extension in MP4_EXTENSIONS:
+                    problems, duration = _check_mp4(data, file_size)
+                elif extension in MKV_EXTENSIONS:
+                    problems, duration = _check_mkv(data, file_size)
+                else:
+                    return {"problems": [], "duration": None}
+    except (IndexError, ValueError, struct.error) as e:
+        return {"problems": [f"Unreadable container structure: {e}"], "duration": None}
+    except OSError as e:
+        return {"problems": [f"Cannot read file: {e}"], "duration": None, "unreadable": True}
+    return {"problems": problems, "duration": duration}
+
+class IntegrityCache:
+    """Container check results keyed by path, size and mtime"""
+
+    def __init__(self, path: str = CACHE_FILE):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                self.entries = {}
+
+    def get(self, path: str, size: int, mtime: float) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(path)
+        if entry and entry["size"] == size and entry["mtime"] == mtime:
+            return entry["result"]
+        return None
+
+    def put(self, path: str, size: int, mtime: float, result: Dict[str, Any]) -> None:
+        self.entries[path] = {"size": size, "mtime": mtime, "result": result}
+
+    def save(self) -> None:
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,103 @@
+import json
+import os
+import re
+import threading
+from typing import Any, List, Optional, Set, Tuple
+
+JOURNAL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "journal")
+
+class CheckpointJournal:
+    """Append-only on-disk record of the items an operation has started and completed
+
+    There is one journal file per operation and library, holding a JSON line
+    per ratingKey event. Events are buffered in memory and a background thread
+    writes and fsyncs them every flush interval, so journaling never waits on
+    the disk per item. The file is removed once the operation completes.
+    """
+
+    def __init__(self, operation: str, library_name: str, flush_interval: float = 2.0):
+        self.path = self.journal_path(operation, library_name)
+        self.flush_interval = flush_interval
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def journal_path(operation: str, library_name: str) -> str:
+        """Get the journal file path for an operation and library"""
+        slug = re.sub(r'[^a-z0-9]+', '-', f"{operation}-{library_name}".lower()).strip('-')
+        return os.path.join(JOURNAL_DIR, f"{slug}.jsonl")
+
+    @classmethod
+    def has_unfinished(cls, operation: str, library_name: str) -> bool:
+        """Check whether an interrupted run left a journal behind"""
+        path = cls.journal_path(operation, library_name)
+        return os.path.exists(path) and os.path.getsize(path) > 0
+
+    def load(self) -> Tuple[Set[Any], Set[Any]]:
+        """Read the journal and return (completed, in_flight) ratingKeys"""
+        started, completed = set(), set()
+        if not os.path.exists(self.path):
+            return completed, started
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be cut short if the run was killed mid-write
+                    continue
+                if entry["state"] == "done":
+                    completed.add(entry["key"])
+                else:
+                    started.add(entry["key"])
+        return completed, started - completed
+
+    def open(self, resume: bool = False) -> None:
+        """Open the journal for writing, keeping existing entries when resuming"""
+        os.makedirs(JOURNAL_DIR, exist_ok=True)
+        self._file = open(self.path, 'a' if resume else 'w')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def started(self, key: Any) -> None:
+        """Record that an item has been dispatched"""
+        self._append(key, "start")
+
+    def completed(self, key: Any) -> None:
+        """Record that an item has finished"""
+        self._append(key, "done")
+
+    def clear(self) -> None:
+        """Remove the journal without running, e.g. when nothing is left to process"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self, finished: bool) -> None:
+        """Flush outstanding entries, removing the journal if the run finished"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._flush()
+        self._file.close()
+        if finished:
+            os.remove(self.path)
+
+    def _append(self, key: Any, state: str) -> None:
+        line = json.dumps({"key": key, "state": state})
+        with self._lock:
+            self._buffer.append(line)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self._flush()
+
+    def _flush(self) -> None:
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if not lines:
+            return
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
@@ -0,0 +1,134 @@
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+from xml.etree.ElementTree import iterparse
+from plexapi.utils import joinArgs, searchType
+from operations.streaming import PAGE_SIZE
+
+ListingTag = namedtuple('ListingTag', 'tag')
+ListingMedia = namedtuple('ListingMedia', 'duration parts')
+ListingPart = namedtuple('ListingPart', 'file size')
+
+def _int(value: Optional[str]) -> Optional[int]:
+    return int(value) if value else None
+
+class ListingItem:
+    """The fields operations read from a section listing, without a plexapi object
+
+    Attribute names match plexapi's, so code reading listings works with
+    either. Timestamps are kept as integers and converted on access. Load
+    the full plexapi item with library.fetchItem before changing anything
+    on it.
+    """
+    __slots__ = ('ratingKey', 'type', 'title', 'thumb', 'year', 'duration', 'labels', 'media',
+                 'grandparentRatingKey', 'grandparentTitle', 'parentIndex', 'index', '_addedAt', '_updatedAt')
+
+    def __init__(self, attrib: Dict[str, str]):
+        self.ratingKey = int(attrib['ratingKey'])
+        self.type = attrib.get('type')
+        self.title = attrib.get('title')
+        self.thumb = attrib.get('thumb')
+        self.year = _int(attrib.get('year'))
+        self.duration = _int(attrib.get('duration'))
+        self.grandparentRatingKey = _int(attrib.get('grandparentRatingKey'))
+        self.grandparentTitle = attrib.get('grandparentTitle')
+        self.parentIndex = _int(attrib.get('parentIndex'))
+        self.index = _int(attrib.get('index'))
+        self._addedAt = _int(attrib.get('addedAt'))
+        self._updatedAt = _int(attrib.get('updatedAt'))
+        self.labels = ()
+        self.media = ()
+
+    def __repr__(self) -> str:
+        return f"<ListingItem:{self.ratingKey}:{self.title}>"
+
+    @property
+    def addedAt(self) -> Optional[datetime]:
+        return datetime.fromtimestamp(self._addedAt) if self._addedAt else None
+
+    @property
+    def updatedAt(self) -> Optional[datetime]:
+        return datetime.fromtimestamp(self._updatedAt) if self._updatedAt else None
+
+    @property
+    def seasonEpisode(self) -> str:
+        return f"s{self.parentIndex or 0:02d}e{self.index or 0:02d}"
+
+def parse_listing(stream, records: List[ListingItem]) -> None:
+    """Parse a section listing from a file-like object into records
+
+    Items are built as their elements start, and each item element is cleared
+    once it ends, so only one item's XML is held in memory at a time.
+    """
+    tags: Dict[str, ListingTag] = {}
+    depth = 0
+    container = None
+    record = None
+    media = None
+    for event, element in iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                container = element
+            elif depth == 2:
+                record = ListingItem(element.attrib)
+                records.append(record)
+            elif record is not None and element.tag == 'Media':
+                media = ListingMedia(_int(element.get('duration')), [])
+                record.media += (media,)
+            elif media is not None and element.tag == 'Part':
+                media.parts.append(ListingPart(element.get('file'), _int(element.get('size'))))
+            elif depth == 3 and element.tag == 'Label':
+                tag = element.get('tag')
+                record.labels += (tags.setdefault(tag, ListingTag(tag)),)
+            continue
+        depth -= 1
+        if depth == 1:
+            record = None
+            media = None
+            container.clear()
+
+class _ParsedResponse:
+    """What server.query needs of a response whose body was already parsed"""
+
+    def __init__(self, response, parsed: bool):
+        self.status_code = response.status_code
+        self.url = response.url
+        self.text = '' if parsed else response.text
+
+def fetch_listing_page(server, key: str) -> List[ListingItem]:
+    """Fetch one listing page through server.query, parsing the XML as it streams in
+
+    The request still goes through server.query, so installed request
+    governors and metrics see it and retried requests start the page over.
+    """
+    records: List[ListingItem] = []
+
+    def get(url, **kwargs):
+        del records[:]
+        with server._session.get(url, stream=True, **kwargs) as response:
+            if response.status_code == 200:
+                response.raw.decode_content = True
+                parse_listing(response.raw, records)
+            return _ParsedResponse(response, response.status_code == 200)
+
+    server.query(key, method=get)
+    return records
+
+def iter_listing(library, libtype: Optional[str] = None, page_size: int = PAGE_SIZE, **filters) -> Iterator[ListingItem]:
+    """Yield compact records of the items matching raw Plex filter arguments, one page at a time
+
+    The counterpart of iter_section_query for read-only passes. Records carry
+    the ids, titles, dates, durations, labels and part files of each item.
+    """
+    args = dict(filters)
+    args['type'] = searchType(libtype or library.TYPE)
+    start = 0
+    while True:
+        args['X-Plex-Container-Start'] = start
+        args['X-Plex-Container-Size'] = page_size
+        page = fetch_listing_page(library._server, f"/library/sections/{library.key}/all{joinArgs(args)}")
+        yield from page
+        if len(page) < page_size:
+            break
+        start += page_size
\ No newline at end of file
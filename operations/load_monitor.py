@@ -0,0 +1,97 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+from operations.events import notify
+
+NORMAL = "normal"
+THROTTLED = "throttled"
+PAUSED = "paused"
+
+class ServerLoadMonitor:
+    """Yield to real viewers by throttling or pausing work while the server is busy
+
+    A background thread polls the server's active sessions and transcodes.
+    Above the throttle threshold the controller is capped to a small number
+    of workers; above the pause thresholds dispatch stops until load drops.
+    Time spent in each state is kept so it can be reported with the stats.
+    """
+
+    def __init__(self, plex, controller, throttle_sessions: int = 1, pause_sessions: int = 5,
+                 pause_transcodes: int = 2, throttled_workers: int = 1, poll_interval: float = 15):
+        self.plex = plex
+        self.controller = controller
+        self.throttle_sessions = throttle_sessions
+        self.pause_sessions = pause_sessions
+        self.pause_transcodes = pause_transcodes
+        self.throttled_workers = throttled_workers
+        self.poll_interval = poll_interval
+        self.state = NORMAL
+        self.seconds = {THROTTLED: 0.0, PAUSED: 0.0}
+        self._state_since = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Check load once, then keep polling in the background"""
+        self.poll()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling and lift any throttle or pause"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._set_state(NORMAL)
+
+    def poll(self) -> None:
+        """Read the server's current load and update the state"""
+        try:
+            sessions = len(self.plex.sessions())
+            transcodes = len(self.plex.transcodeSessions())
+        except Exception as e:
+            notify(f"Could not check server load: {e}")
+            return
+
+        if sessions >= self.pause_sessions or transcodes >= self.pause_transcodes:
+            state = PAUSED
+        elif sessions >= self.throttle_sessions:
+            state = THROTTLED
+        else:
+            state = NORMAL
+
+        if state != self.state:
+            notify(f"Server load: {sessions} sessions, {transcodes} transcodes - {state}")
+        self._set_state(state)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.poll()
+
+    def _set_state(self, state: str) -> None:
+        now = time.monotonic()
+        if self.state in self.seconds:
+            self.seconds[self.state] += now - self._state_since
+        self.state = state
+        self._state_since = now
+
+        if state == PAUSED:
+            self.controller.set_cap(0)
+        elif state == THROTTLED:
+            self.controller.set_cap(self.throttled_workers)
+        else:
+            self.controller.set_cap(None)
+
+def create_load_monitor(plex, controller, settings: Optional[Dict[str, Any]] = None) -> Optional[ServerLoadMonitor]:
+    """Build a load monitor from the load settings, or None when disabled"""
+    if not settings or not settings.get("enabled"):
+        return None
+    return ServerLoadMonitor(
+        plex,
+        controller,
+        throttle_sessions=settings.get("throttle_sessions", 1),
+        pause_sessions=settings.get("pause_sessions", 5),
+        pause_transcodes=settings.get("pause_transcodes", 2),
+        throttled_workers=settings.get("throttled_workers", 1),
+        poll_interval=settings.get("poll_interval", 15)
+    )
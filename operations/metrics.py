@@ -0,0 +1,265 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+
+# Upper bounds in seconds, the last bucket catches everything slower
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+def endpoint_name(path: str) -> str:
+    """Reduce a request path to its endpoint, e.g. /library/metadata/{id}/posters"""
+    path = path.split('?', 1)[0].rstrip('/') or '/'
+    return re.sub(r'/\d+', '/{id}', path)
+
+class LatencyHistogram:
+    """Request count, total time and bucketed latencies of one endpoint"""
+    __slots__ = ('counts', 'total', 'count', 'errors')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+        self.total += seconds
+        self.count += 1
+        self.errors += int(error)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.total += other.total
+        self.count += other.count
+        self.errors += other.errors
+
+    def quantile(self, fraction: float) -> float:
+        """Estimate a latency quantile as the upper bound of the bucket holding it"""
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound if bound != float('inf') else BUCKETS[-2]
+        return 0.0
+
+class RequestMetrics:
+    """Per-endpoint latency histograms of every Plex request a run makes
+
+    Each worker thread records into its own set of histograms, so timing a
+    request never takes a lock. The per-thread sets are merged when the run
+    is exported.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple[str, str], LatencyHistogram]] = []
+        self._lock = threading.Lock()
+        self._installed = {}
+
+    def install(self, plex) -> None:
+        """Time every query made through a PlexServer and the items it returns"""
+        previous = plex.__dict__.get('query')
+        original = plex.query
+
+        def query(key, method=None, **kwargs):
+            with self.timed(getattr(method, '__name__', 'get').upper(), key):
+                return original(key, method=method, **kwargs)
+
+        self._installed[id(plex)] = previous
+        plex.query = query
+
+    def uninstall(self, plex) -> None:
+        """Restore the query method a PlexServer had before install"""
+        if id(plex) not in self._installed:
+            return
+        previous = self._installed.pop(id(plex))
+        if previous is None:
+            del plex.query
+        else:
+            plex.query = previous
+
+    @contextmanager
+    def timed(self, method: str, path: str) -> Iterator[None]:
+        """Time the enclosed request, counting it as an error if it raises"""
+        started = time.perf_counter()
+        error = True
+        try:
+            yield
+            error = False
+        finally:
+            self.observe(method, path, time.perf_counter() - started, error)
+
+    def observe(self, method: str, path: str, seconds: float, error: bool = False) -> None:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        key = (method, endpoint_name(path))
+        histogram = shard.get(key)
+        if histogram is None:
+            histogram = shard[key] = LatencyHistogram()
+        histogram.observe(seconds, error)
+
+    def merged(self) -> Dict[Tuple[str, str], LatencyHistogram]:
+        """Combine every thread's histograms by endpoint"""
+        merged: Dict[Tuple[str, str], LatencyHistogram] = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, histogram in list(shard.items()):
+                merged.setdefault(key, LatencyHistogram()).merge(histogram)
+        return merged
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            f"{method} {endpoint}": {
+                "count": histogram.count,
+                "errors": histogram.errors,
+                "total_seconds": round(histogram.total, 6),
+                "mean_ms": round(histogram.total / histogram.count * 1000, 3) if histogram.count else 0.0,
+                "p50_ms": histogram.quantile(0.50) * 1000,
+                "p95_ms": histogram.quantile(0.95) * 1000,
+                "buckets": {_bound(bound): count for bound, count in zip(BUCKETS, histogram.counts)},
+            }
+            for (method, endpoint), histogram in sorted(self.merged().items())
+        }
+
+    def to_prometheus(self, labels: Dict[str, str], summary: Optional[Dict[str, Any]] = None) -> str:
+        """Render the histograms, and optionally the run's counters, in the Prometheus text format"""
+        base = ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+        lines = [
+            "# HELP pmt_request_duration_seconds Plex request latency by endpoint",
+            "# TYPE pmt_request_duration_seconds histogram",
+        ]
+        histograms = sorted(self.merged().items())
+        for (method, endpoint), histogram in histograms:
+            series = f'{base},method="{method}",endpoint="{_escape(endpoint)}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'pmt_request_duration_seconds_bucket{{{series},le="{_bound(bound)}"}} {cumulative}')
+            lines.append(f'pmt_request_duration_seconds_sum{{{series}}} {histogram.total:.6f}')
+            lines.append(f'pmt_request_duration_seconds_count{{{series}}} {histogram.count}')
+        lines += [
+            "# HELP pmt_request_errors_total Failed Plex requests by endpoint",
+            "# TYPE pmt_request_errors_total counter",
+        ]
+        for (method, endpoint), histogram in histograms:
+            lines.append(f'pmt_request_errors_total{{{base},method="{method}",endpoint="{_escape(endpoint)}"}} {histogram.errors}')
+        for name, value in sorted((summary or {}).items()):
+            if isinstance(value, (int, float)):
+                lines.append(f'pmt_operation_{name}{{{base}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        """Clear every histogram, e.g. between runs sharing one connection"""
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def export(self, operation: str, library_name: str, summary: Optional[Dict[str, Any]] = None,
+               textfile_dir: Optional[str] = None, directory: str = LOG_DIR) -> None:
+        """Write the run's metrics as JSON and as a Prometheus textfile
+
+        The JSON goes to the logs directory. The textfile goes to textfile_dir
+        when given (e.g. the node exporter's textfile collector directory),
+        otherwise next to the JSON.
+        """
+        slug = _slug(f"{operation}-{library_name}")
+        os.makedirs(directory, exist_ok=True)
+        _write_atomic(os.path.join(directory, f"metrics-{slug}.json"), json.dumps({
+            "operation": operation,
+            "library": library_name,
+            "summary": summary or {},
+            "endpoints": self.to_json(),
+        }, indent=4, default=str))
+        prom_dir = textfile_dir or directory
+        os.makedirs(prom_dir, exist_ok=True)
+        _write_atomic(os.path.join(prom_dir, f"pmt-{slug}.prom"),
+                      self.to_prometheus({"operation": operation, "library": library_name}, summary))
+
+def _bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else f"{bound:g}"
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _slug(value: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', value.lower()).strip('-')
+
+def _write_atomic(path: str, content: str) -> None:
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+class RunProfiler:
+    """Profile a run with cProfile and tracemalloc
+
+    Worker threads started while profiling are profiled too. On stop, the
+    top functions by cumulative time and the top allocation sites are
+    written to profile-<operation>-<library>.txt in the logs directory.
+    """
+
+    def __init__(self, operation: str, library_name: str, directory: str = LOG_DIR, top: int = 40):
+        self.path = os.path.join(directory, f"profile-{_slug(f'{operation}-{library_name}')}.txt")
+        self.top = top
+        self._profiles: List[cProfile.Profile] = []
+        # Before 3.12 cProfile only sees the thread that enabled it
+        self._per_thread = sys.version_info < (3, 12)
+
+    def start(self) -> None:
+        """Start profiling this thread and every thread started from now on"""
+        tracemalloc.start(25)
+        if self._per_thread:
+            threading.setprofile(self._start_thread_profile)
+        self._profiles.append(cProfile.Profile())
+        self._profiles[0].enable()
+
+    def stop(self) -> None:
+        """Stop profiling and write the report, does nothing if already stopped"""
+        if not self._profiles:
+            return
+        self._profiles[0].disable()
+        if self._per_thread:
+            threading.setprofile(None)
+        allocations = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        profiles, self._profiles = self._profiles, []
+        output = io.StringIO()
+        stats = pstats.Stats(profiles[0], stream=output)
+        for profile in profiles[1:]:
+            stats.add(profile)
+        output.write(f"Top {self.top} functions by cumulative time\n")
+        stats.sort_stats('cumulative').print_stats(self.top)
+        output.write(f"\nTop {self.top} allocation sites\n")
+        for stat in allocations.statistics('lineno')[:self.top]:
+            output.write(f"{stat}\n")
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        _write_atomic(self.path, output.getvalue())
+        print(f"Profile written to {self.path}")
+
+    def _start_thread_profile(self, *_) -> None:
+        # Runs as the first profile event of a new thread, then hands over to cProfile
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        self._profiles.append(profile)
+        profile.enable()
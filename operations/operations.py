@@ -1,16 +1,45 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from collections import defaultdict
+from collections import defaultdict, deque
 import asyncio
 import os
-from typing import List, Dict, Any
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import List, Dict, Any, Optional, Set, Tuple
+from urllib.parse import quote_plus
 from datetime import datetime, timedelta
+from operations.audit import audit_library
+from operations.async_engine import AsyncPlexClient, async_available, iter_section_items_async, stream_process_async
+from operations.batch_edits import LabelBatcher
+from operations.concurrency import create_controller
+from operations.events import EventBus
+from operations.governor import track_counts
+from operations.journal import CheckpointJournal
+from operations.listing import iter_listing
+from operations.load_monitor import PAUSED, THROTTLED, create_load_monitor
+from operations.integrity import IntegrityCache, check_container
+from operations.path_scan import PathItem, map_path, scan_media_files, stat_files
+from operations.plans import MutationPlan, PlannedItem, epoch
+from operations.runtime_stats import DurationTable
+from operations.streaming import (
+    count_section_items, iter_section_levels, iter_section_query, section_levels, stream_process
+)
 from utils.utils import format_progress_bar, print_operation_header, confirm_action
 
+# Errors kept in memory for errors.log, every error is also in the event log
+MAX_KEPT_ERRORS = 1000
+
 class OperationStats:
     def __init__(self):
         self.stats = defaultdict(int)
         self.start_time = datetime.now()
-        self.errors = []
+        self.errors = deque(maxlen=MAX_KEPT_ERRORS)
+        self.error_count = 0
+        self.events: Optional[EventBus] = None
+        # Governor counts of this operation alone, the governor itself may be shared
+        self.requests = track_counts()
+        self._lock = threading.Lock()
         # Get the directory where your main script (pmt.py) is located
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
         # Create path to logs directory
@@ -21,12 +50,49 @@ class OperationStats:
             os.makedirs(self.log_dir)
 
     def update(self, **kwargs):
-        for key, value in kwargs.items():
-            self.stats[key] += value
+        with self._lock:
+            for key, value in kwargs.items():
+                self.stats[key] += value
 
     def log_error(self, item_title, error_msg):
-        """Log an error message"""
-        self.errors.append(f"{item_title}: {error_msg}")
+        """Log an error message, streaming it to the event log while events are open"""
+        with self._lock:
+            self.errors.append(f"{item_title}: {error_msg}")
+            self.error_count += 1
+        if self.events:
+            self.events.error(item_title, error_msg)
+
+    def open_events(self, operation_name, library_name, total, workers=None):
+        """Start the event bus drawing progress and writing the event log"""
+        self.events = EventBus(operation_name, library_name, total, workers)
+
+    def item(self, item_title, status, **fields):
+        """Report a finished item to the event bus"""
+        if self.events:
+            self.events.item(item_title, status, **fields)
+
+    def message(self, text):
+        """Print a notice, above the progress bar while events are open"""
+        if self.events:
+            self.events.message(text)
+        else:
+            print(f"\n{text}")
+
+    def close_events(self):
+        """Write out the remaining events and draw the final progress bar"""
+        if self.events:
+            events, self.events = self.events, None
+            events.close()
+
+    def record_load(self, monitor):
+        """Record how long the run spent paused or throttled for server load"""
+        if monitor:
+            self.update(paused_seconds=monitor.seconds[PAUSED], throttled_seconds=monitor.seconds[THROTTLED])
+
+    def record_governor(self, governor):
+        """Record the retries and circuit breaker trips of this operation's requests"""
+        if governor:
+            self.update(retries=self.requests["retries"], breaker_trips=self.requests["breaker_trips"])
 
     def get_summary(self) -> Dict[str, Any]:
         duration = datetime.now() - self.start_time
@@ -43,6 +109,9 @@ class OperationStats:
             error_file = os.path.join(self.log_dir, "errors.log")
             with open(error_file, "a") as f:
                 f.write(separator)
+                omitted = self.error_count - len(self.errors)
+                if omitted:
+                    f.write(f"... {omitted} earlier errors omitted, see the events log\n")
                 for error in self.errors:
                     f.write(f"{error}\n")
 
@@ -53,122 +122,360 @@ class OperationStats:
             f.write(separator)
             f.write(f"Items Processed: {summary['processed']}/{self.stats.get('total', 0)}\n")
             f.write(f"Labels Removed: {summary.get('removed', 0)}\n")
+            if 'labeled' in summary:
+                f.write(f"Labels Applied: {summary['labeled']}\n")
+            if 'skipped' in summary:
+                f.write(f"Items Skipped: {summary['skipped']}\n")
+            if 'stale' in summary:
+                f.write(f"Changed Since Planning: {summary['stale']}\n")
             f.write(f"Errors Encountered: {summary.get('errors', 0)}\n")
+            if 'retries' in summary:
+                f.write(f"Request Retries: {summary['retries']}\n")
+                f.write(f"Circuit Breaker Trips: {summary['breaker_trips']}\n")
+            if 'paused_seconds' in summary:
+                f.write(f"Paused For Load: {summary['paused_seconds']:.1f} seconds\n")
+                f.write(f"Throttled For Load: {summary['throttled_seconds']:.1f} seconds\n")
             f.write(f"Duration: {summary['duration_seconds']:.1f} seconds\n")
 
-async def cleanup_labels_operation(plex, library_name: str, worker_count: int, preserve_labels: List[str]):
-    """Clean up labels for a specific library"""
+def _print_governor_summary(summary: Dict[str, Any]):
+    """Print request retries and circuit breaker trips, if a governor was used"""
+    if 'retries' in summary:
+        print(f"Request Retries: {summary['retries']}")
+        print(f"Circuit Breaker Trips: {summary['breaker_trips']}")
+
+def _print_load_summary(summary: Dict[str, Any]):
+    """Print time spent yielding to active streams, if load monitoring ran"""
+    if 'paused_seconds' in summary:
+        print(f"Paused For Load: {summary['paused_seconds']:.1f} seconds")
+        print(f"Throttled For Load: {summary['throttled_seconds']:.1f} seconds")
+
+@contextmanager
+def _worker_run(plex, stats: OperationStats, operation_name: str, library_name: str, total_items: int,
+                worker_count: int, concurrency: Optional[Dict[str, Any]] = None,
+                load_limits: Optional[Dict[str, Any]] = None, controller=None):
+    """Set up the controller, load monitor and event bus for a worker run, yields the controller"""
+    monitor = None
+    if controller is None:
+        controller = create_controller(worker_count, concurrency)
+        monitor = create_load_monitor(plex, controller, load_limits)
+    stats.open_events(operation_name, library_name, total_items, lambda: controller.workers)
+    if monitor:
+        monitor.start()
+    try:
+        yield controller
+    finally:
+        if monitor:
+            monitor.stop()
+        stats.close_events()
+    stats.record_load(monitor)
+
+def _finish_deletions(library, stats: OperationStats, empty_trash: bool, refresh: bool):
+    """Empty the library trash and start a scan after deletions, as requested"""
+    if not stats.stats.get('deleted'):
+        return
+    if empty_trash:
+        try:
+            print("Emptying library trash...")
+            library.emptyTrash()
+        except Exception as e:
+            print(f"\nError emptying trash: {e}")
+            stats.log_error(library.title, f"Failed to empty trash: {e}")
+            stats.update(errors=1)
+    if refresh:
+        try:
+            print("Starting library scan...")
+            library.update()
+        except Exception as e:
+            print(f"\nError starting library scan: {e}")
+            stats.log_error(library.title, f"Failed to start library scan: {e}")
+            stats.update(errors=1)
+
+class _PosterDefaults:
+    """Items known to be at their default poster, from the snapshot and from this run
+
+    known checks an item's thumb against the one remembered when it was last
+    found at its default poster, so it can be skipped without asking the
+    server. at_default checks whether an item's first poster candidate is
+    the selected one, and remembers its thumb for the snapshot if so.
+    """
+
+    def __init__(self, library, snapshot=None):
+        self.library = library
+        self.snapshot = snapshot
+        self.thumbs = snapshot.default_poster_thumbs(library) if snapshot else {}
+        self.found: List[Tuple[int, str]] = []
+
+    def known(self, key: int, thumb: Optional[str]) -> bool:
+        return bool(thumb) and self.thumbs.get(key) == thumb
+
+    def at_default(self, key: int, thumb: Optional[str], first_selected: bool) -> bool:
+        if first_selected:
+            self.found.append((key, thumb))
+        return first_selected
+
+    def save(self):
+        """Record the items found at their default poster in the snapshot"""
+        if self.snapshot:
+            self.snapshot.record_default_posters(self.library, self.found)
+
+def _plan_label_cleanup(library, preserve_labels: List[str], snapshot=None,
+                        levels: Optional[List[str]] = None) -> List[Tuple[Any, List[str]]]:
+    """Find the items carrying removable labels
+
+    The section's label list is read from the server and the preserved labels
+    are subtracted. With a metadata snapshot, the snapshot is synced and the
+    plan is read from it; otherwise one filtered search runs per removable
+    label, so only tagged items are fetched. Each level (e.g. shows, seasons
+    and episodes) is planned with its own label list. Returns
+    (item, labels_to_remove) pairs.
+    """
+    preserve = {label.lower() for label in preserve_labels}
+    plan = {}
+    for libtype in levels or [library.TYPE]:
+        removable = [
+            choice for choice in library.listFilterChoices('label', libtype=libtype)
+            if choice.title.lower() not in preserve
+        ]
+        
+        if snapshot:
+            print(f"Syncing metadata snapshot ({libtype})...")
+            print(f"Fetched {snapshot.sync(library, libtype)} new or changed items")
+            removable_titles = {choice.title.lower() for choice in removable}
+            for item in snapshot.items_with_labels(library, removable_titles, libtype):
+                plan[item.ratingKey] = (item, [label for label in item.labels if label.lower() in removable_titles])
+            continue
+        
+        for choice in removable:
+            print(f"Finding {libtype} items labeled '{choice.title}'...")
+            for item in iter_listing(library, libtype, label=choice.key):
+                plan.setdefault(item.ratingKey, (item, []))[1].append(choice.title)
+    return list(plan.values())
+
+async def cleanup_labels_operation(plex, library_name: str, worker_count: int, preserve_labels: List[str],
+                                   concurrency: Optional[Dict[str, Any]] = None,
+                                   load_limits: Optional[Dict[str, Any]] = None,
+                                   snapshot=None,
+                                   governor=None,
+                                   hierarchical: bool = False,
+                                   controller=None) -> Optional[Dict[str, Any]]:
+    """Clean up labels for a specific library, at the show, season and episode level when hierarchical"""
     try:
         print_operation_header("Label Cleanup", library_name)
         library = plex.library.section(library_name)
-        all_items = library.all()
-        total_items = len(all_items)
+        plan = _plan_label_cleanup(library, preserve_labels, snapshot, section_levels(library, hierarchical))
+        total_items = len(plan)
         
         if not total_items:
-            print(f"No items found in library: {library_name}")
+            print(f"No items with removable labels found in library: {library_name}")
             return
         
         stats = OperationStats()
         stats.update(total=total_items)
+        batcher = LabelBatcher(library, stats)
         
-        def process_item(item, index):
+        def process_item(entry, index):
+            item, labels_to_remove = entry
             try:
-                original_labels = item.labels
-                if original_labels:
-                    labels_to_remove = [
-                        label for label in original_labels
-                        if label.tag.lower() not in preserve_labels
-                    ]
-                    
-                    if labels_to_remove:
-                        for label in labels_to_remove:
-                            item.removeLabel(label.tag) # Use removeLabel instead of removeLabels
-                        print(f"\r{format_progress_bar(index, total_items)} - Removed {len(labels_to_remove)} labels from: {item.title}")
-                        return {"removed": len(labels_to_remove), "processed": 1}
-                return {"removed": 0, "processed": 1}
+                for label in labels_to_remove:
+                    batcher.remove(item, label)
+                stats.item(item.title, "queued", key=item.ratingKey, labels=labels_to_remove)
+                return {"processed": 1}
             except Exception as e:
-                print(f"\nError processing {item.title}: {e}")
                 stats.log_error(item.title, str(e))
-                return {"removed": 0, "processed": 0, "errors": 1}
+                stats.item(item.title, "failed", key=item.ratingKey)
+                return {"processed": 0, "errors": 1}
         
-        with ThreadPoolExecutor(max_workers=worker_count) as executor:
-            futures = [
-                executor.submit(process_item, item, i+1) 
-                for i, item in enumerate(all_items)
-            ]
-            
-            for future in as_completed(futures):
-                stats.update(**future.result())
+        with _worker_run(plex, stats, "Label Cleanup", library_name, total_items, worker_count,
+                         concurrency, load_limits, controller) as controller:
+            for result in stream_process(plan, process_item, worker_count, controller=controller):
+                stats.update(**result)
+            batcher.flush()
+        stats.record_governor(governor)
         
         summary = stats.get_summary()
         print("\nOperation Summary:")
         print(f"Items Processed: {summary['processed']}/{total_items}")
-        print(f"Labels Removed: {summary['removed']}")
+        print(f"Labels Removed: {summary.get('removed', 0)}")
+        print(f"Label Requests: {summary.get('batch_requests', 0) + summary.get('fallback_requests', 0)}")
         print(f"Errors Encountered: {summary.get('errors', 0)}")
+        print(f"Final Workers: {controller.limit}")
+        _print_governor_summary(summary)
+        _print_load_summary(summary)
         print(f"Duration: {summary['duration_seconds']:.1f} seconds")
         
         # Save logs
         stats.save_logs("Label Cleanup", library_name)
+        return summary
         
     except Exception as e:
         raise Exception(f"Label cleanup failed: {e}")
 
-async def reset_posters_operation(plex, library_name: str, worker_count: int):
-    """Reset posters for a specific library"""
+async def reset_posters_operation(plex, library_name: str, worker_count: int,
+                                  concurrency: Optional[Dict[str, Any]] = None,
+                                  load_limits: Optional[Dict[str, Any]] = None,
+                                  resume: bool = False,
+                                  snapshot=None,
+                                  use_async: bool = True,
+                                  governor=None,
+                                  hierarchical: bool = False,
+                                  controller=None,
+                                  metrics=None) -> Optional[Dict[str, Any]]:
+    """Reset posters for a specific library, skipping items already at their default poster"""
     try:
         print_operation_header("Poster Reset", library_name)
         library = plex.library.section(library_name)
-        all_items = library.all()
-        total_items = len(all_items)
+        levels = section_levels(library, hierarchical)
+        journal = CheckpointJournal("Poster Reset", library_name)
+        completed, in_flight = journal.load() if resume else (set(), set())
+        if completed or in_flight:
+            # Items deleted since the interrupted run must not count toward the total
+            live = {item.ratingKey for libtype in levels for item in iter_listing(library, libtype)}
+            completed &= live
+            in_flight &= live
+            total_items = len(live) - len(completed)
+        else:
+            total_items = sum(count_section_items(library, libtype) for libtype in levels)
         
-        if not total_items:
+        if total_items <= 0:
             print(f"No items found in library: {library_name}")
+            journal.clear()
             return
         
+        if resume:
+            print(f"Resuming: skipping {len(completed)} completed items, retrying {len(in_flight)} in-flight items")
+        
         stats = OperationStats()
         stats.update(total=total_items)
+        defaults = _PosterDefaults(library, snapshot)
+        
+        def pending_items():
+            for key in in_flight:
+                try:
+                    yield library.fetchItem(key)
+                except Exception as e:
+                    stats.log_error(str(key), f"Could not reload in-flight item: {e}")
+            for item in iter_section_levels(library, levels):
+                if item.ratingKey not in completed and item.ratingKey not in in_flight:
+                    yield item
         
         def process_item(item, index):
             try:
+                journal.started(item.ratingKey)
+                if defaults.known(item.ratingKey, item.thumb):
+                    journal.completed(item.ratingKey)
+                    stats.item(item.title, "skipped", key=item.ratingKey)
+                    return {"skipped": 1, "processed": 1}
                 posters = item.posters()
+                if posters and defaults.at_default(item.ratingKey, item.thumb, posters[0].selected):
+                    journal.completed(item.ratingKey)
+                    stats.item(item.title, "skipped", key=item.ratingKey)
+                    return {"skipped": 1, "processed": 1}
                 if posters:
                     item.setPoster(posters[0])
-                    print(f"\r{format_progress_bar(index, total_items)} - Reset poster for: {item.title}")
+                    journal.completed(item.ratingKey)
+                    stats.item(item.title, "reset", key=item.ratingKey)
                     return {"reset": 1, "processed": 1}
                 else:
                     item.refresh()
-                    print(f"\r{format_progress_bar(index, total_items)} - Refreshed metadata for: {item.title}")
+                    journal.completed(item.ratingKey)
+                    stats.item(item.title, "refreshed", key=item.ratingKey)
                     return {"refreshed": 1, "processed": 1}
             except Exception as e:
-                print(f"\nError processing {item.title}: {e}")
                 stats.log_error(item.title, str(e))
+                stats.item(item.title, "failed", key=item.ratingKey)
+                return {"reset": 0, "refreshed": 0, "processed": 0, "errors": 1}
+        
+        async def pending_items_async(client):
+            for key in in_flight:
+                try:
+                    container = await client.get(f"/library/metadata/{key}")
+                    for item in container.get('Metadata', []):
+                        yield item
+                except Exception as e:
+                    stats.log_error(str(key), f"Could not reload in-flight item: {e}")
+            for libtype in levels:
+                async for item in iter_section_items_async(client, library, libtype):
+                    key = int(item['ratingKey'])
+                    if key not in completed and key not in in_flight:
+                        yield item
+        
+        async def process_item_async(client, item, index):
+            key = int(item['ratingKey'])
+            title = item.get('title', key)
+            thumb = item.get('thumb')
+            try:
+                journal.started(key)
+                if defaults.known(key, thumb):
+                    journal.completed(key)
+                    stats.item(title, "skipped", key=key)
+                    return {"skipped": 1, "processed": 1}
+                posters = (await client.get(f"/library/metadata/{key}/posters")).get('Metadata', [])
+                if posters and defaults.at_default(key, thumb, bool(posters[0].get('selected'))):
+                    journal.completed(key)
+                    stats.item(title, "skipped", key=key)
+                    return {"skipped": 1, "processed": 1}
+                if posters:
+                    await client.put(f"/library/metadata/{key}/poster", url=posters[0]['ratingKey'])
+                    journal.completed(key)
+                    stats.item(title, "reset", key=key)
+                    return {"reset": 1, "processed": 1}
+                else:
+                    await client.put(f"/library/metadata/{key}/refresh")
+                    journal.completed(key)
+                    stats.item(title, "refreshed", key=key)
+                    return {"refreshed": 1, "processed": 1}
+            except Exception as e:
+                stats.log_error(title, str(e))
+                stats.item(title, "failed", key=key)
                 return {"reset": 0, "refreshed": 0, "processed": 0, "errors": 1}
         
-        with ThreadPoolExecutor(max_workers=worker_count) as executor:
-            futures = [
-                executor.submit(process_item, item, i+1) 
-                for i, item in enumerate(all_items)
-            ]
-            
-            for future in as_completed(futures):
-                stats.update(**future.result())
+        journal.open(resume=resume)
+        finished = False
+        try:
+            with _worker_run(plex, stats, "Poster Reset", library_name, total_items, worker_count,
+                             concurrency, load_limits, controller) as controller:
+                if use_async and async_available():
+                    async with AsyncPlexClient.from_server(plex, controller.ceiling, governor=governor, metrics=metrics) as client:
+                        items = pending_items_async(client)
+                        async for result in stream_process_async(items, partial(process_item_async, client), controller):
+                            stats.update(**result)
+                else:
+                    for result in stream_process(pending_items(), process_item, worker_count, controller=controller):
+                        stats.update(**result)
+            finished = True
+        finally:
+            journal.close(finished)
+            defaults.save()
+        stats.record_governor(governor)
         
         summary = stats.get_summary()
         print("\nOperation Summary:")
         print(f"Items Processed: {summary['processed']}/{total_items}")
         print(f"Posters Reset: {summary.get('reset', 0)}")
+        print(f"Already Default (Skipped): {summary.get('skipped', 0)}")
         print(f"Metadata Refreshed: {summary.get('refreshed', 0)}")
         print(f"Errors Encountered: {summary.get('errors', 0)}")
+        print(f"Final Workers: {controller.limit}")
+        _print_governor_summary(summary)
+        _print_load_summary(summary)
         print(f"Duration: {summary['duration_seconds']:.1f} seconds")
         
         # Save logs
         stats.save_logs("Poster Reset", library_name)
+        return summary
         
     except Exception as e:
         raise Exception(f"Poster reset failed: {e}")
 
-async def delete_recent_movies_operation(plex, library_name: str, hours: int = 48):
-    """Delete movies added in the last specified hours"""
+async def delete_recent_movies_operation(plex, library_name: str, hours: int = 48, worker_count: int = 1,
+                                         concurrency: Optional[Dict[str, Any]] = None,
+                                         load_limits: Optional[Dict[str, Any]] = None,
+                                         empty_trash: bool = False,
+                                         refresh: bool = False,
+                                         governor=None,
+                                         controller=None,
+                                         assume_yes: bool = False) -> Optional[Dict[str, Any]]:
+    """Delete movies added in the last specified hours, assume_yes skips the confirmation"""
     try:
         print_operation_header("Recent Movie Deletion", library_name)
         library = plex.library.section(library_name)
@@ -177,10 +484,9 @@ async def delete_recent_movies_operation(plex, library_name: str, hours: int = 4
         cutoff_time = datetime.now() - timedelta(hours=hours)
         
         # Get recent items
-        recent_items = []
-        for item in library.all():
-            if item.addedAt and item.addedAt > cutoff_time:
-                recent_items.append(item)
+        recent_items = list(iter_section_query(
+            library, sort='addedAt:desc', **{'addedAt>>': int(cutoff_time.timestamp())}
+        ))
         
         if not recent_items:
             print(f"No items found added in the last {hours} hours")
@@ -192,7 +498,7 @@ async def delete_recent_movies_operation(plex, library_name: str, hours: int = 4
             print(f"{idx}. {item.title} (Added: {item.addedAt})")
         
         # Confirm deletion
-        if not confirm_action("\nAre you sure you want to delete these items?"):
+        if not assume_yes and not confirm_action("\nAre you sure you want to delete these items?"):
             print("Operation cancelled")
             return
         
@@ -200,29 +506,506 @@ async def delete_recent_movies_operation(plex, library_name: str, hours: int = 4
         total_items = len(recent_items)
         stats.update(total=total_items)
         
-        # Process deletions
-        for idx, item in enumerate(recent_items, 1):
+        def process_item(item, index):
             try:
-                print(f"\r{format_progress_bar(idx, total_items)} - Deleting: {item.title}")
                 item.delete()
-                stats.update(deleted=1, processed=1)
+                stats.item(item.title, "deleted", key=item.ratingKey)
+                return {"deleted": 1, "processed": 1}
             except Exception as e:
-                print(f"\nError deleting {item.title}: {e}")
                 stats.log_error(item.title, str(e))
-                stats.update(errors=1)
+                stats.item(item.title, "failed", key=item.ratingKey)
+                return {"deleted": 0, "processed": 0, "errors": 1}
         
+        # Process deletions
+        with _worker_run(plex, stats, "Recent Movie Deletion", library_name, total_items, worker_count,
+                         concurrency, load_limits, controller) as controller:
+            for result in stream_process(recent_items, process_item, worker_count, controller=controller):
+                stats.update(**result)
+        _finish_deletions(library, stats, empty_trash, refresh)
+        
+        stats.record_governor(governor)
         summary = stats.get_summary()
         print("\nOperation Summary:")
         print(f"Items Found: {total_items}")
         print(f"Items Deleted: {summary.get('deleted', 0)}")
         print(f"Errors Encountered: {summary.get('errors', 0)}")
+        print(f"Final Workers: {controller.limit}")
+        _print_governor_summary(summary)
+        _print_load_summary(summary)
         print(f"Duration: {summary['duration_seconds']:.1f} seconds")
         
         # Save logs
         stats.save_logs("Recent Movie Deletion", library_name)
         
-        if summary.get('deleted', 0) > 0:
+        if summary.get('deleted', 0) > 0 and not empty_trash:
             print("\nNote: You may want to empty the trash in Plex to fully remove these items")
+        return summary
+        
+    except Exception as e:
+        raise Exception(f"Recent movie deletion failed: {e}")
+
+async def plan_label_cleanup_operation(plex, library_name: str, preserve_labels: List[str],
+                                       snapshot=None, hierarchical: bool = False) -> MutationPlan:
+    """Work out the labels a label cleanup would remove, without changing anything"""
+    try:
+        print_operation_header("Plan Label Cleanup", library_name)
+        created_at = time.time()
+        library = plex.library.section(library_name)
+        plan = _plan_label_cleanup(library, preserve_labels, snapshot, section_levels(library, hierarchical))
+        items = [PlannedItem.from_item(item, labels=labels) for item, labels in plan]
+        return MutationPlan('cleanup_labels', library_name, items, created_at=created_at)
+        
+    except Exception as e:
+        raise Exception(f"Label cleanup planning failed: {e}")
+
+async def plan_poster_reset_operation(plex, library_name: str, worker_count: int,
+                                      concurrency: Optional[Dict[str, Any]] = None,
+                                      load_limits: Optional[Dict[str, Any]] = None,
+                                      snapshot=None,
+                                      hierarchical: bool = False,
+                                      controller=None) -> MutationPlan:
+    """Work out which posters a poster reset would select, without changing anything
+
+    Each item's poster list is read on the worker threads, as in a poster
+    reset, and items already at their default poster are left out of the
+    plan. Running this under a small concurrency ceiling keeps the reads
+    gentle on the server.
+    """
+    try:
+        print_operation_header("Plan Poster Reset", library_name)
+        created_at = time.time()
+        library = plex.library.section(library_name)
+        server = library._server
+        levels = section_levels(library, hierarchical)
+        total_items = sum(count_section_items(library, libtype) for libtype in levels)
+        
+        stats = OperationStats()
+        stats.update(total=total_items)
+        defaults = _PosterDefaults(library, snapshot)
+        planned = []
+        
+        def listed_items():
+            for libtype in levels:
+                yield from iter_listing(library, libtype)
+        
+        def process_item(item, index):
+            try:
+                if defaults.known(item.ratingKey, item.thumb):
+                    stats.item(item.title, "skipped", key=item.ratingKey)
+                    return {"skipped": 1, "processed": 1}
+                posters = server.query(f"/library/metadata/{item.ratingKey}/posters")
+                first = posters[0] if posters is not None and len(posters) else None
+                if first is not None and defaults.at_default(item.ratingKey, item.thumb,
+                                                             first.get('selected') in ('1', 'true')):
+                    stats.item(item.title, "skipped", key=item.ratingKey)
+                    return {"skipped": 1, "processed": 1}
+                planned.append(PlannedItem.from_item(item, poster=first.get('ratingKey') if first is not None else ''))
+                stats.item(item.title, "planned", key=item.ratingKey)
+                return {"planned": 1, "processed": 1}
+            except Exception as e:
+                stats.log_error(item.title, str(e))
+                stats.item(item.title, "failed", key=item.ratingKey)
+                return {"processed": 0, "errors": 1}
+        
+        try:
+            with _worker_run(plex, stats, "Plan Poster Reset", library_name, total_items, worker_count,
+                             concurrency, load_limits, controller) as controller:
+                for result in stream_process(listed_items(), process_item, worker_count, controller=controller):
+                    stats.update(**result)
+        finally:
+            defaults.save()
+        
+        summary = stats.get_summary()
+        print("\nPlanning Summary:")
+        print(f"Items Checked: {summary.get('processed', 0)}/{total_items}")
+        print(f"Items Planned: {summary.get('planned', 0)}")
+        print(f"Already Default (Skipped): {summary.get('skipped', 0)}")
+        print(f"Errors Encountered: {summary.get('errors', 0)}")
+        print(f"Duration: {summary['duration_seconds']:.1f} seconds")
+        stats.save_logs("Plan Poster Reset", library_name)
+        planned.sort(key=lambda item: item.ratingKey)
+        return MutationPlan('reset_posters', library_name, planned, created_at=created_at, summary=summary)
+        
+    except Exception as e:
+        raise Exception(f"Poster reset planning failed: {e}")
+
+async def plan_recent_deletes_operation(plex, library_name: str, hours: int = 48,
+                                        empty_trash: bool = False, refresh: bool = False) -> MutationPlan:
+    """Work out which recently added items a recent deletion would delete, without changing anything"""
+    try:
+        print_operation_header("Plan Recent Movie Deletion", library_name)
+        created_at = time.time()
+        library = plex.library.section(library_name)
+        cutoff_time = datetime.now() - timedelta(hours=hours)
+        items = [
+            PlannedItem.from_item(item)
+            for item in iter_listing(library, sort='addedAt:desc', **{'addedAt>>': int(cutoff_time.timestamp())})
+        ]
+        return MutationPlan('delete_recent', library_name, items,
+                            options={"hours": hours, "empty_trash": empty_trash, "refresh": refresh},
+                            created_at=created_at)
+        
+    except Exception as e:
+        raise Exception(f"Recent movie deletion planning failed: {e}")
+
+def _changed_since_planning(library, plan: MutationPlan) -> Set[int]:
+    """Find planned items whose updatedAt moved after planning started
+
+    Only items updated since then are listed, with one filtered listing per
+    item type in the plan, so nothing is re-read item by item.
+    """
+    planned = {item.ratingKey: item.updatedAt for item in plan.items}
+    changed = set()
+    for libtype in sorted({item.type for item in plan.items}):
+        for item in iter_listing(library, libtype, **{'updatedAt>>': int(plan.created_at) - 1}):
+            if item.ratingKey in planned and epoch(item.updatedAt) != planned[item.ratingKey]:
+                changed.add(item.ratingKey)
+    return changed
+
+async def apply_plan_operation(plex, plan: MutationPlan, worker_count: int,
+                               concurrency: Optional[Dict[str, Any]] = None,
+                               load_limits: Optional[Dict[str, Any]] = None,
+                               governor=None,
+                               controller=None) -> Optional[Dict[str, Any]]:
+    """Make the changes of a saved plan, skipping items changed since planning"""
+    try:
+        print_operation_header(f"Apply {plan.name}", plan.library)
+        library = plex.library.section(plan.library)
+        server = library._server
+        stale = _changed_since_planning(library, plan)
+        items = sorted((item for item in plan.items if item.ratingKey not in stale), key=lambda item: item.ratingKey)
+        total_items = len(items)
+        
+        if stale:
+            print(f"Skipping {len(stale)} items changed since planning")
+        if not total_items:
+            print(f"Nothing left to apply to library: {plan.library}")
+            return
+        
+        stats = OperationStats()
+        stats.update(total=total_items, stale=len(stale))
+        batcher = LabelBatcher(library, stats) if plan.operation == 'cleanup_labels' else None
+        
+        def process_item(item, index):
+            try:
+                if batcher:
+                    for label in item.labels:
+                        batcher.remove(item, label)
+                    result = {"processed": 1}
+                    status = "queued"
+                elif plan.operation == 'reset_posters' and item.poster:
+                    server.query(f"/library/metadata/{item.ratingKey}/poster?url={quote_plus(item.poster)}",
+                                 method=server._session.put)
+                    result = {"reset": 1, "processed": 1}
+                    status = "reset"
+                elif plan.operation == 'reset_posters':
+                    server.query(f"/library/metadata/{item.ratingKey}/refresh", method=server._session.put)
+                    result = {"refreshed": 1, "processed": 1}
+                    status = "refreshed"
+                else:
+                    server.query(f"/library/metadata/{item.ratingKey}", method=server._session.delete)
+                    result = {"deleted": 1, "processed": 1}
+                    status = "deleted"
+                stats.item(item.title, status, key=item.ratingKey)
+                return result
+            except Exception as e:
+                stats.log_error(item.title, str(e))
+                stats.item(item.title, "failed", key=item.ratingKey)
+                return {"processed": 0, "errors": 1}
+        
+        with _worker_run(plex, stats, f"Apply {plan.name}", plan.library, total_items, worker_count,
+                         concurrency, load_limits, controller) as controller:
+            for result in stream_process(items, process_item, worker_count, controller=controller):
+                stats.update(**result)
+            if batcher:
+                batcher.flush()
+        _finish_deletions(library, stats, plan.options.get('empty_trash', False), plan.options.get('refresh', False))
+        
+        stats.record_governor(governor)
+        summary = stats.get_summary()
+        print("\nOperation Summary:")
+        print(f"Items Applied: {summary.get('processed', 0)}/{total_items}")
+        print(f"Changed Since Planning (Skipped): {len(stale)}")
+        if plan.operation == 'cleanup_labels':
+            print(f"Labels Removed: {summary.get('removed', 0)}")
+            print(f"Label Requests: {summary.get('batch_requests', 0) + summary.get('fallback_requests', 0)}")
+        elif plan.operation == 'reset_posters':
+            print(f"Posters Reset: {summary.get('reset', 0)}")
+            print(f"Metadata Refreshed: {summary.get('refreshed', 0)}")
+        else:
+            print(f"Items Deleted: {summary.get('deleted', 0)}")
+        print(f"Errors Encountered: {summary.get('errors', 0)}")
+        print(f"Final Workers: {controller.limit}")
+        _print_governor_summary(summary)
+        _print_load_summary(summary)
+        print(f"Duration: {summary['duration_seconds']:.1f} seconds")
+        
+        # Save logs
+        stats.save_logs(f"Apply {plan.name}", plan.library)
+        return summary
+        
+    except Exception as e:
+        raise Exception(f"Applying {plan.name.lower()} plan failed: {e}")
+
+async def find_abnormal_runtimes(plex, library_name: str, worker_count: int,
+                                 threshold: float = 3.0, min_group_size: int = 3) -> Dict[str, List[Dict[str, Any]]]:
+    """Find movies and episodes whose runtime is far from the norm
+
+    Movies are compared against the rest of the library and episodes against
+    the other episodes of their show. Durations are collected in one paged
+    pass into compact arrays while per-group statistics accumulate, then
+    z-scores are computed for all items at once. Listing is sequential, so
+    worker_count is not used.
+    """
+    try:
+        library = plex.library.section(library_name)
+        table = DurationTable()
+        
+        if library.type == 'movie':
+            for item in iter_listing(library):
+                if item.duration:
+                    table.add(item.ratingKey, item.title, item.duration)
+        elif library.type == 'show':
+            for item in iter_listing(library, libtype='episode'):
+                if item.duration:
+                    table.add(item.ratingKey, item.title, item.duration,
+                              item.grandparentRatingKey, item.grandparentTitle)
+        
+        print(f"Analyzed {len(table)} items")
+        flagged = table.flag(threshold, min_group_size)
+        return {
+            'movies': flagged if library.type == 'movie' else [],
+            'episodes': flagged if library.type == 'show' else []
+        }
+        
+    except Exception as e:
+        raise Exception(f"Runtime analysis failed: {e}")
+
+def _display_title(item) -> str:
+    """Get a title that identifies an item, including the show for episodes"""
+    if item.type == 'episode':
+        return f"{item.grandparentTitle} - {item.seasonEpisode.upper()} - {item.title}"
+    return item.title
+
+async def verify_media_paths(plex, library_name: str, path_mappings: Optional[Dict[str, str]] = None,
+                             scan_workers: int = 16) -> List[Dict[str, Any]]:
+    """Check that every media file Plex knows about exists on disk with the expected size
+
+    Part paths are translated from server paths to local paths with the
+    configured prefix mappings, then checked directory by directory. Media
+    files in those directories that Plex doesn't know about are reported as
+    orphans.
+    """
+    try:
+        library = plex.library.section(library_name)
+        libtype = 'episode' if library.type == 'show' else None
+        mappings = path_mappings or {}
+        
+        files = []
+        for item in iter_listing(library, libtype=libtype):
+            record = PathItem(item.ratingKey, _display_title(item))
+            for media in item.media:
+                for part in media.parts:
+                    if part.file:
+                        files.append((record, map_path(part.file, mappings), part.size))
+        
+        print(f"Checking {len(files)} media files...")
+        return scan_media_files(files, scan_workers)
+        
+    except Exception as e:
+        raise Exception(f"Media path verification failed: {e}")
+
+async def verify_media_integrity(plex, library_name: str, worker_count: int,
+                                 path_mappings: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """Check the container structure of every media file in a library
+
+    MP4 atoms (ftyp/moov/mdat) and MKV EBML, Segment, Info and Cues elements
+    are verified in a process pool by memory-mapping each file and reading
+    only the headers and trailers they point to. The container duration is
+    compared with the duration Plex recorded. Results are cached by path, size
+    and mtime so reruns only re-check files that changed.
+    """
+    try:
+        library = plex.library.section(library_name)
+        libtype = 'episode' if library.type == 'show' else None
+        mappings = path_mappings or {}
+        
+        files = []
+        for item in iter_listing(library, libtype=libtype):
+            record = PathItem(item.ratingKey, _display_title(item))
+            for media in item.media:
+                # Plex's duration covers all parts, so only compare single-part media
+                expected = media.duration if len(media.parts) == 1 else None
+                for part in media.parts:
+                    if part.file:
+                        files.append((record, map_path(part.file, mappings), expected))
+        
+        issues = []
+        cache = IntegrityCache()
+        file_stats = stat_files(path for _, path, _ in files)
+        results = {}
+        to_check = []
+        for record, path, _ in files:
+            stat = file_stats[path]
+            if isinstance(stat, Exception):
+                issues.append({'item': record, 'error': f"Cannot read file: {stat}"})
+                continue
+            cached = cache.get(path, stat.st_size, stat.st_mtime)
+            if cached is None:
+                to_check.append(path)
+            else:
+                results[path] = cached
+        
+        print(f"Checking {len(to_check)} media files ({len(results)} unchanged since last check)...")
+        with ProcessPoolExecutor(max_workers=worker_count) as executor:
+            for index, (path, result) in enumerate(zip(to_check, executor.map(check_container, to_check, chunksize=8)), 1):
+                stat = file_stats[path]
+                if not result.get("unreadable"):
+                    cache.put(path, stat.st_size, stat.st_mtime, result)
+                results[path] = result
+                if index % 100 == 0 or index == len(to_check):
+                    print(f"\r{format_progress_bar(index, len(to_check))}", end="")
+        cache.save()
+        
+        for record, path, expected in files:
+            result = results.get(path)
+            if result is None:
+                continue
+            problems = list(result["problems"])
+            actual = result["duration"]
+            if expected and actual and abs(actual - expected) > max(2000, expected * 0.02):
+                problems.append(
+                    f"Duration mismatch (Plex: {expected/60000:.1f} minutes, container: {actual/60000:.1f} minutes)"
+                )
+            if problems:
+                issues.append({'item': record, 'issues': problems})
+        return issues
+        
+    except Exception as e:
+        raise Exception(f"Media integrity check failed: {e}")
+
+BULK_LABEL_FILTERS = {
+    'resolution': 'resolution',
+    'codec': 'videoCodec',
+    'genre': 'genre',
+    'year': 'year',
+    'rating': 'contentRating'
+}
+
+def _filter_choice_key(library, field: str, title: str) -> Optional[str]:
+    """Look up the server-side key of a filter value (e.g. a genre or label) by title"""
+    for choice in library.listFilterChoices(field):
+        if choice.title.lower() == title.lower():
+            return choice.key
+    return None
+
+def _bulk_label_filters(library, criteria: Dict[str, Any], label: str) -> Dict[str, Any]:
+    """Translate bulk label criteria into server-side filters
+
+    Items that already carry the label are excluded by the server as well.
+    """
+    filters = {}
+    for criteria_type, value in criteria.items():
+        if criteria_type not in BULK_LABEL_FILTERS:
+            raise ValueError(f"Unsupported criteria: {criteria_type}")
+        value = str(value).strip()
+        if criteria_type == 'resolution':
+            # Plex stores "1080p" as "1080" and "4K" as "4k"
+            value = value.lower().rstrip('p')
+        elif criteria_type == 'genre':
+            genre_key = _filter_choice_key(library, 'genre', value)
+            if genre_key is None:
+                raise ValueError(f"Genre not found in library: {value}")
+            value = genre_key
+        filters[BULK_LABEL_FILTERS[criteria_type]] = value
+    
+    label_key = _filter_choice_key(library, 'label', label)
+    if label_key is not None:
+        filters['label!'] = label_key
+    return filters
+
+async def bulk_label_operation(plex, library_name: str, worker_count: int,
+                               criteria: Dict[str, Any], label: str) -> List[Dict[str, Any]]:
+    """Apply a label to every item matching the criteria
+
+    The criteria are sent to the server as filters, so only matching items
+    without the label come back. Labels are then applied through batched
+    multi-item edits. Returns one {'item', 'labeled'} or {'item', 'error'}
+    entry per item.
+    """
+    try:
+        print_operation_header("Bulk Label", library_name)
+        library = plex.library.section(library_name)
+        filters = _bulk_label_filters(library, criteria, label)
+        
+        # Collect matches before editing, labeling items shifts the filtered pages
+        items = [
+            item for item in iter_listing(library, **filters)
+            if not any(existing.tag.lower() == label.lower() for existing in item.labels)
+        ]
+        total_items = len(items)
+        results = []
+        
+        if not total_items:
+            print("No matching items without this label found")
+            return results
+        
+        stats = OperationStats()
+        stats.update(total=total_items)
+        
+        def record(item, tag, error):
+            if error:
+                results.append({'item': item, 'error': str(error)})
+            else:
+                results.append({'item': item, 'labeled': tag})
+        
+        batcher = LabelBatcher(library, stats, on_result=record)
+        
+        def process_item(item, index):
+            batcher.add(item, label)
+            stats.item(item.title, "queued", key=item.ratingKey)
+            return {"processed": 1}
+        
+        stats.open_events("Bulk Label", library_name, total_items)
+        try:
+            for result in stream_process(items, process_item, worker_count):
+                stats.update(**result)
+            batcher.flush()
+        finally:
+            stats.close_events()
+        
+        summary = stats.get_summary()
+        print(f"Label Requests: {summary.get('batch_requests', 0) + summary.get('fallback_requests', 0)}")
+        stats.save_logs("Bulk Label", library_name)
+        return results
+        
+    except Exception as e:
+        raise Exception(f"Bulk label failed: {e}")
+
+async def find_incomplete_metadata(plex, library_name: str, worker_count: int) -> List[Dict[str, Any]]:
+    """Find items missing a summary, poster, year, release date or genres"""
+    try:
+        library = plex.library.section(library_name)
+        issues = []
+        for item, found in audit_library(library, worker_count, check='incomplete metadata'):
+            missing = {rule.name: True for rule, _ in found if rule.category == 'metadata'}
+            if missing:
+                issues.append({'item': item, 'issues': missing})
+        return issues
+        
+    except Exception as e:
+        raise Exception(f"Metadata completeness check failed: {e}")
+
+async def verify_release_dates(plex, library_name: str, worker_count: int) -> List[Dict[str, Any]]:
+    """Find items whose release date conflicts with their year or when they were added"""
+    try:
+        library = plex.library.section(library_name)
+        issues = []
+        for item, found in audit_library(library, worker_count, check='release dates'):
+            for rule, details in found:
+                if rule.category == 'dates':
+                    issues.append({'item': item, **details})
+        return issues
         
     except Exception as e:
-        raise Exception(f"Recent movie deletion failed: {e}")
\ No newline at end of file
+        raise Exception(f"Release date verification failed: {e}")
\ No newline at end of file
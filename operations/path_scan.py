@@ -0,0 +1,116 @@
+import os
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+PathItem = namedtuple('PathItem', 'ratingKey title')
+
+MEDIA_EXTENSIONS = {
+    '.avi', '.m2ts', '.m4v', '.mkv', '.mov', '.mp4', '.mpeg', '.mpg', '.ts', '.webm', '.wmv',
+    '.flac', '.m4a', '.mp3', '.ogg', '.wav',
+}
+
+def map_path(path: str, mappings: Dict[str, str]) -> str:
+    """Translate a server-side path to a local one using the longest matching prefix"""
+    for server_prefix in sorted(mappings, key=len, reverse=True):
+        if path.startswith(server_prefix):
+            path = mappings[server_prefix] + path[len(server_prefix):]
+            break
+    return os.path.normpath(path)
+
+def _scan_directory(directory: str, expected: List[Tuple[PathItem, str, Optional[int]]]) -> List[Dict[str, Any]]:
+    """List one directory and compare its contents with the files Plex expects in it"""
+    try:
+        with os.scandir(directory) as it:
+            entries = {entry.name: entry for entry in it}
+    except FileNotFoundError:
+        entries = {}
+    except OSError as e:
+        return [{'item': item, 'issue': f"Cannot read directory: {e}", 'path': path} for item, path, _ in expected]
+
+    issues = []
+    known = set()
+    for item, path, size in expected:
+        name = os.path.basename(path)
+        known.add(name)
+        entry = entries.get(name)
+        if entry is None:
+            issues.append({'item': item, 'issue': "File not found", 'path': path})
+        elif size is not None:
+            try:
+                actual = entry.stat().st_size
+            except FileNotFoundError:
+                # Removed since the listing, or a symlink whose target is gone
+                issues.append({'item': item, 'issue': "File not found", 'path': path})
+                continue
+            except OSError as e:
+                issues.append({'item': item, 'issue': f"Cannot read file: {e}", 'path': path})
+                continue
+            if actual != size:
+                issues.append({
+                    'item': item,
+                    'issue': f"Size mismatch (Plex: {size} bytes, disk: {actual} bytes)",
+                    'path': path
+                })
+
+    for name, entry in entries.items():
+        if (name not in known and entry.is_file()
+                and os.path.splitext(name)[1].lower() in MEDIA_EXTENSIONS):
+            issues.append({
+                'item': PathItem(None, name),
+                'issue': "Orphan file not known to Plex",
+                'path': entry.path
+            })
+    return issues
+
+def scan_media_files(files: Iterable[Tuple[PathItem, str, Optional[int]]], worker_count: int = 16) -> List[Dict[str, Any]]:
+    """Check (item, local_path, size) entries on disk, listing each parent directory once
+
+    Files are grouped by directory and directories are scanned in parallel,
+    so each directory costs one listing plus a stat only for files whose size
+    is checked, instead of a stat per file over a slow network mount.
+    """
+    by_directory = defaultdict(list)
+    for entry in files:
+        by_directory[os.path.dirname(entry[1])].append(entry)
+
+    issues = []
+    with ThreadPoolExecutor(max_workers=worker_count) as executor:
+        for directory_issues in executor.map(lambda group: _scan_directory(*group), by_directory.items()):
+            issues.extend(directory_issues)
+    return issues
+
+def _stat_directory(directory: str, names: List[str]) -> Dict[str, Any]:
+    try:
+        with os.scandir(directory) as it:
+            entries = {entry.name: entry for entry in it}
+    except OSError as e:
+        return {os.path.join(directory, name): e for name in names}
+    results = {}
+    for name in names:
+        entry = entries.get(name)
+        path = os.path.join(directory, name)
+        if entry is None:
+            results[path] = FileNotFoundError(f"File not found: {path}")
+            continue
+        try:
+            results[path] = entry.stat()
+        except OSError as e:
+            results[path] = e
+    return results
+
+def stat_files(paths: Iterable[str], worker_count: int = 16) -> Dict[str, Any]:
+    """Stat many files, listing each parent directory once
+
+    Returns a mapping of path to os.stat_result, or to the OSError raised for
+    files that are missing or unreadable.
+    """
+    by_directory = defaultdict(list)
+    for path in paths:
+        by_directory[os.path.dirname(path)].append(os.path.basename(path))
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=worker_count) as executor:
+        for directory_results in executor.map(lambda group: _stat_directory(*group), by_directory.items()):
+            results.update(directory_results)
+    return results
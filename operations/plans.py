@@ -0,0 +1,155 @@
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from operations.batch_edits import BATCH_SIZE
+
+PLAN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "plans")
+
+PLAN_VERSION = 1
+
+PLAN_OPERATIONS = {
+    'cleanup_labels': "Label Cleanup",
+    'reset_posters': "Poster Reset",
+    'delete_recent': "Recent Movie Deletion",
+}
+
+def epoch(value) -> Optional[int]:
+    """Whole seconds of a datetime or timestamp, as Plex reports updatedAt"""
+    if value is None:
+        return None
+    return int(value.timestamp() if hasattr(value, 'timestamp') else value)
+
+class PlannedItem:
+    """One item of a plan and the change to make to it
+
+    labels holds the labels to remove and poster the poster to select, where
+    an empty poster means the item has none and its metadata is refreshed.
+    updatedAt is the item's updatedAt when it was planned.
+    """
+    __slots__ = ('ratingKey', 'type', 'title', 'updatedAt', 'labels', 'poster')
+
+    def __init__(self, ratingKey: int, type: str, title: str, updatedAt: Optional[int],
+                 labels: Optional[List[str]] = None, poster: Optional[str] = None):
+        self.ratingKey = ratingKey
+        self.type = type
+        self.title = title
+        self.updatedAt = updatedAt
+        self.labels = labels
+        self.poster = poster
+
+    @classmethod
+    def from_item(cls, item, **change) -> "PlannedItem":
+        return cls(item.ratingKey, item.type, item.title, epoch(item.updatedAt), **change)
+
+    def to_json(self) -> Dict[str, Any]:
+        entry = {"ratingKey": self.ratingKey, "type": self.type, "title": self.title, "updatedAt": self.updatedAt}
+        if self.labels is not None:
+            entry["labels"] = self.labels
+        if self.poster is not None:
+            entry["poster"] = self.poster
+        return entry
+
+class MutationPlan:
+    """The exact changes an operation will make to a library, worked out ahead of time
+
+    A plan is built by a read-only planning pass and saved as JSON, so it can
+    be reviewed and applied later. Applying only writes: items whose
+    updatedAt moved since planning are skipped rather than re-read.
+    summary holds the planning run's own summary, errors included, and is
+    not saved.
+    """
+
+    def __init__(self, operation: str, library: str, items: List[PlannedItem],
+                 options: Optional[Dict[str, Any]] = None, created_at: Optional[float] = None,
+                 summary: Optional[Dict[str, Any]] = None):
+        if operation not in PLAN_OPERATIONS:
+            raise ValueError(f"Unknown plan operation '{operation}', expected one of {', '.join(PLAN_OPERATIONS)}")
+        self.operation = operation
+        self.library = library
+        self.items = items
+        self.options = options or {}
+        self.created_at = created_at or time.time()
+        self.summary = summary or {}
+
+    @property
+    def name(self) -> str:
+        return PLAN_OPERATIONS[self.operation]
+
+    def counts(self) -> Dict[str, int]:
+        """Items and changes in the plan, and the write requests applying it should take"""
+        counts = {"items": len(self.items)}
+        if self.operation == 'cleanup_labels':
+            batches = Counter((item.type, label) for item in self.items for label in item.labels)
+            counts["labels"] = sum(batches.values())
+            counts["requests"] = sum(math.ceil(count / BATCH_SIZE) for count in batches.values())
+        elif self.operation == 'reset_posters':
+            counts["refreshes"] = sum(1 for item in self.items if not item.poster)
+            counts["posters"] = len(self.items) - counts["refreshes"]
+            counts["requests"] = len(self.items)
+        else:
+            counts["deletes"] = len(self.items)
+            counts["requests"] = len(self.items) + sum(1 for key in ('empty_trash', 'refresh') if self.options.get(key))
+        return counts
+
+    def review(self, limit: int = 20) -> None:
+        """Print what applying the plan would do"""
+        counts = self.counts()
+        print(f"\n{self.name} plan for {self.library}")
+        print(f"Planned: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.created_at))}")
+        print(f"Items: {counts['items']}")
+        if self.operation == 'cleanup_labels':
+            print(f"Labels To Remove: {counts['labels']}")
+        elif self.operation == 'reset_posters':
+            print(f"Posters To Reset: {counts['posters']}")
+            print(f"Metadata To Refresh: {counts['refreshes']}")
+        else:
+            print(f"Items To Delete: {counts['deletes']}")
+            if self.options.get('empty_trash'):
+                print("Then empty the library trash")
+            if self.options.get('refresh'):
+                print("Then scan the library")
+        print(f"Estimated Requests: {counts['requests']}")
+        for item in self.items[:limit]:
+            if self.operation == 'cleanup_labels':
+                print(f"- {item.title}: remove {', '.join(item.labels)}")
+            elif self.operation == 'reset_posters':
+                print(f"- {item.title}: {'reset poster' if item.poster else 'refresh metadata'}")
+            else:
+                print(f"- {item.title}: delete")
+        if len(self.items) > limit:
+            print(f"... and {len(self.items) - limit} more")
+
+    def default_path(self) -> str:
+        slug = re.sub(r'[^a-z0-9]+', '-', f"{self.operation}-{self.library}".lower()).strip('-')
+        return os.path.join(PLAN_DIR, f"plan-{slug}.json")
+
+    def save(self, path: Optional[str] = None) -> str:
+        """Write the plan as JSON, by default to the plans directory, returns the path"""
+        path = path or self.default_path()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({
+                "version": PLAN_VERSION,
+                "operation": self.operation,
+                "library": self.library,
+                "created_at": self.created_at,
+                "options": self.options,
+                "counts": self.counts(),
+                "items": [item.to_json() for item in self.items],
+            }, f, indent=1)
+        os.replace(temp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "MutationPlan":
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get("version") != PLAN_VERSION:
+            raise ValueError(f"Unsupported plan version in {path}")
+        items = [PlannedItem(**entry) for entry in data["items"]]
+        return cls(data["operation"], data["library"], items, data.get("options"), data["created_at"])
\ No newline at end of file
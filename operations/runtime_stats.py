@@ -0,0 +1,99 @@
+import math
+from array import array
+from collections import namedtuple
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RuntimeItem = namedtuple('RuntimeItem', 'ratingKey title grandparentTitle')
+
+class RunningStats:
+    """Welford accumulator for the mean and standard deviation of a stream of values"""
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+class DurationTable:
+    """Compact columnar store of item durations grouped by show (or library)
+
+    Durations, keys and group indexes are kept in typed arrays and each
+    group's statistics are accumulated as items are added, so a single
+    streaming pass is enough to flag outliers afterwards.
+    """
+
+    def __init__(self):
+        self.keys = array('q')
+        self.durations = array('q')
+        self.groups = array('l')
+        self.titles: List[str] = []
+        self.group_titles: List[Optional[str]] = []
+        self.group_stats: List[RunningStats] = []
+        self._group_index: Dict[Any, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.durations)
+
+    def add(self, key: int, title: str, duration: int, group_key: Any = None, group_title: Optional[str] = None) -> None:
+        """Add an item's duration to its group"""
+        group = self._group_index.get(group_key)
+        if group is None:
+            group = self._group_index[group_key] = len(self.group_stats)
+            self.group_stats.append(RunningStats())
+            self.group_titles.append(group_title)
+        self.group_stats[group].add(duration)
+        self.keys.append(key)
+        self.durations.append(duration)
+        self.groups.append(group)
+        self.titles.append(title)
+
+    def flag(self, threshold: float, min_group_size: int) -> List[Dict[str, Any]]:
+        """Find items whose duration is more than threshold standard deviations from their group mean"""
+        if not self.durations:
+            return []
+        counts = [stats.count for stats in self.group_stats]
+        means = [stats.mean for stats in self.group_stats]
+        stds = [stats.std if stats.count >= min_group_size else 0.0 for stats in self.group_stats]
+
+        if np is not None:
+            durations = np.frombuffer(self.durations, dtype=np.int64)
+            groups = np.frombuffer(self.groups, dtype=np.dtype(f'i{self.groups.itemsize}'))
+            group_means = np.asarray(means)[groups]
+            group_stds = np.asarray(stds)[groups]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                deviations = np.where(group_stds > 0, np.abs(durations - group_means) / group_stds, 0.0)
+            flagged = np.nonzero(deviations >= threshold)[0].tolist()
+            deviations = deviations.tolist()
+        else:
+            deviations = [
+                abs(duration - means[group]) / stds[group] if stds[group] else 0.0
+                for duration, group in zip(self.durations, self.groups)
+            ]
+            flagged = [index for index, deviation in enumerate(deviations) if deviation >= threshold]
+
+        results = []
+        for index in flagged:
+            group = self.groups[index]
+            results.append({
+                'item': RuntimeItem(self.keys[index], self.titles[index], self.group_titles[group]),
+                'duration': self.durations[index],
+                'mean_duration': means[group],
+                'deviation': deviations[index],
+                'group_size': counts[group],
+            })
+        return sorted(results, key=lambda result: result['deviation'], reverse=True)
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from operations.concurrency import create_controller
+from operations.governor import create_governor
+from operations.journal import CheckpointJournal
+from operations.load_monitor import create_load_monitor
+from operations.metrics import RequestMetrics
+from operations.operations import cleanup_labels_operation, reset_posters_operation
+from operations.snapshot import MetadataSnapshot
+
+STATE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "schedule_state.json")
+
+JOB_OPERATIONS = ('cleanup_labels', 'reset_posters')
+
+WINDOW_CHECK_SECONDS = 30
+RETRY_SECONDS = 3600
+
+def _minutes(value: str) -> int:
+    hours, _, minutes = value.partition(':')
+    return int(hours) * 60 + int(minutes or 0)
+
+class OffPeakWindows:
+    """Daily time ranges in which scheduled work may run
+
+    Windows are "HH:MM" start and end times in local time, and may wrap past
+    midnight (e.g. 23:00 to 05:00). With no windows configured, work may run
+    at any time.
+    """
+
+    def __init__(self, windows: List[Dict[str, str]]):
+        self.ranges = [(_minutes(window["start"]), _minutes(window["end"])) for window in windows]
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        if not self.ranges:
+            return True
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        for start, end in self.ranges:
+            if start <= end and start <= minute < end:
+                return True
+            if start > end and (minute >= start or minute < end):
+                return True
+        return False
+
+class ScheduledJob:
+    """One operation run on one library every so many hours"""
+
+    def __init__(self, library: str, operation: str, every_hours: float):
+        if operation not in JOB_OPERATIONS:
+            raise ValueError(f"Unknown scheduled operation '{operation}', expected one of {', '.join(JOB_OPERATIONS)}")
+        self.library = library
+        self.operation = operation
+        self.every_seconds = every_hours * 3600
+
+    @property
+    def key(self) -> str:
+        return f"{self.operation}:{self.library}"
+
+class MaintenanceScheduler:
+    """Run scheduled maintenance jobs inside off-peak windows
+
+    The scheduler keeps one Plex connection, request governor, concurrency
+    controller, load monitor and metadata snapshot open for its whole life,
+    so jobs after the first reuse the warm connection and only sync metadata
+    that changed. Due jobs run one at a time while a window is open.
+
+    A background thread watches the windows. When one closes, the controller
+    is capped to zero so a running job stops dispatching items and waits; it
+    carries on when the next window opens. Poster resets also journal their
+    progress, so a job cut short by a restart resumes where it stopped. A
+    job's last run is recorded in schedule_state.json once it completes.
+    """
+
+    def __init__(self, plex, config_manager, state_path: str = STATE_FILE):
+        schedule = config_manager.get_schedule()
+        self.plex = plex
+        self.config_manager = config_manager
+        self.state_path = state_path
+        self.check_interval = schedule.get("check_interval", 60)
+        self.windows = OffPeakWindows(schedule.get("windows", []))
+        self.jobs = [
+            ScheduledJob(job["library"], job["operation"], job.get("every_hours", 24))
+            for job in schedule.get("jobs", [])
+        ]
+        self.state: Dict[str, Dict[str, Any]] = self._load_state()
+        self.governor = create_governor(config_manager.get_governor_settings())
+        self.controller = create_controller(config_manager.get_worker_count(), config_manager.get_concurrency_settings())
+        self.monitor = create_load_monitor(plex, self.controller, config_manager.get_load_settings())
+        self.diagnostics = config_manager.get_diagnostics_settings()
+        self.metrics = RequestMetrics() if self.diagnostics["metrics"] else None
+        self.snapshot: Optional[MetadataSnapshot] = None
+        self._stop = threading.Event()
+
+    def run(self) -> None:
+        """Dispatch due jobs until stopped"""
+        if not self.jobs:
+            print("No scheduled jobs configured")
+            return
+        if self.metrics:
+            self.metrics.install(self.plex)
+        if self.governor:
+            self.governor.install(self.plex)
+        self.snapshot = MetadataSnapshot() if self.config_manager.use_snapshot() else None
+        watcher = threading.Thread(target=self._watch_windows, daemon=True)
+        watcher.start()
+        if self.monitor:
+            self.monitor.start()
+        print(f"Scheduler started with {len(self.jobs)} jobs")
+        try:
+            while not self._stop.is_set():
+                if self.windows.is_open():
+                    for job in self.due_jobs():
+                        if self._stop.is_set():
+                            break
+                        self._run_job(job)
+                self._stop.wait(self.check_interval)
+        finally:
+            self._stop.set()
+            watcher.join()
+            if self.monitor:
+                self.monitor.stop()
+            if self.snapshot:
+                self.snapshot.close()
+            if self.governor:
+                self.governor.uninstall(self.plex)
+            if self.metrics:
+                self.metrics.uninstall(self.plex)
+
+    def stop(self) -> None:
+        """Stop after the current check; a running job is left to its journal"""
+        self._stop.set()
+
+    def due_jobs(self, now: Optional[float] = None) -> List[ScheduledJob]:
+        """Get the jobs whose interval has passed and are not waiting to retry"""
+        now = now or time.time()
+        due = []
+        for job in self.jobs:
+            entry = self.state.get(job.key, {})
+            if now < entry.get("retry_at", 0):
+                continue
+            if now - entry.get("last_run", 0) >= job.every_seconds:
+                due.append(job)
+        return due
+
+    def _run_job(self, job: ScheduledJob) -> None:
+        print(f"\nRunning scheduled {job.operation} on {job.library}")
+        entry = self.state.setdefault(job.key, {})
+        summary = None
+        if self.metrics:
+            self.metrics.reset()
+        try:
+            summary = asyncio.run(self._dispatch(job))
+            entry.update(last_run=time.time(), last_error=None)
+            entry.pop("retry_at", None)
+        except Exception as e:
+            print(f"\nScheduled {job.operation} on {job.library} failed: {e}")
+            entry.update(last_error=str(e), retry_at=time.time() + min(job.every_seconds, RETRY_SECONDS))
+        self._save_state()
+        if self.metrics:
+            self.metrics.export(job.operation, job.library, summary, self.diagnostics["textfile_dir"] or None)
+
+    async def _dispatch(self, job: ScheduledJob) -> Optional[Dict[str, Any]]:
+        config = self.config_manager
+        worker_count = config.get_worker_count()
+        if job.operation == 'cleanup_labels':
+            return await cleanup_labels_operation(
+                self.plex, job.library, worker_count, config.get_preserve_labels(),
+                snapshot=self.snapshot, governor=self.governor,
+                hierarchical=config.use_tv_hierarchy(), controller=self.controller
+            )
+        else:
+            return await reset_posters_operation(
+                self.plex, job.library, worker_count,
+                resume=CheckpointJournal.has_unfinished("Poster Reset", job.library),
+                snapshot=self.snapshot, use_async=config.use_async_http(), governor=self.governor,
+                hierarchical=config.use_tv_hierarchy(), controller=self.controller, metrics=self.metrics
+            )
+
+    def _watch_windows(self) -> None:
+        is_open = None
+        while True:
+            now_open = self.windows.is_open()
+            if now_open != is_open:
+                if is_open is not None:
+                    print(f"\nOff-peak window {'opened' if now_open else 'closed'}")
+                self.controller.set_cap(None if now_open else 0, source="window")
+                is_open = now_open
+            if self._stop.wait(WINDOW_CHECK_SECONDS):
+                break
+        self.controller.set_cap(None, source="window")
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, OSError):
+                pass
+        return {}
+
+    def _save_state(self) -> None:
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(temp_path, self.state_path)
\ No newline at end of file
@@ -0,0 +1,180 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from operations.listing import iter_listing
+from operations.streaming import count_section_items
+
+SNAPSHOT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "snapshot.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    library TEXT NOT NULL,
+    rating_key INTEGER NOT NULL,
+    title TEXT,
+    type TEXT,
+    added_at REAL,
+    updated_at REAL,
+    labels TEXT,
+    thumb TEXT,
+    parts TEXT,
+    PRIMARY KEY (library, rating_key)
+);
+CREATE TABLE IF NOT EXISTS default_posters (
+    library TEXT NOT NULL,
+    rating_key INTEGER NOT NULL,
+    thumb TEXT,
+    PRIMARY KEY (library, rating_key)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    library TEXT PRIMARY KEY,
+    high_water REAL,
+    synced_at REAL
+);
+"""
+
+class SnapshotItem:
+    """Item metadata as stored in the snapshot"""
+    __slots__ = ('ratingKey', 'title', 'type', 'addedAt', 'updatedAt', 'labels', 'thumb', 'parts')
+
+    def __init__(self, ratingKey, title, type, addedAt, updatedAt, labels, thumb, parts):
+        self.ratingKey = ratingKey
+        self.title = title
+        self.type = type
+        self.addedAt = addedAt
+        self.updatedAt = updatedAt
+        self.labels = labels
+        self.thumb = thumb
+        self.parts = parts
+
+def _library_id(library, libtype: Optional[str] = None) -> str:
+    """Snapshot key of a library, with seasons and episodes stored apart from shows"""
+    if libtype and libtype != library.TYPE:
+        return f"{library.key}:{libtype}"
+    return str(library.key)
+
+def _timestamp(value) -> Optional[float]:
+    return value.timestamp() if value else None
+
+def _item_row(library_id: str, item) -> tuple:
+    parts = [part.file for media in getattr(item, 'media', None) or [] for part in media.parts]
+    return (
+        library_id,
+        item.ratingKey,
+        item.title,
+        item.type,
+        _timestamp(item.addedAt),
+        _timestamp(item.updatedAt),
+        json.dumps([label.tag for label in item.labels]),
+        item.thumb,
+        json.dumps(parts),
+    )
+
+class MetadataSnapshot:
+    """Local SQLite copy of library metadata that operations can plan against
+
+    The first sync of a library pulls every item. Later syncs only fetch items
+    whose updatedAt is newer than the stored high-water mark, and fall back to
+    a full pull when the server's item count no longer matches the snapshot
+    (items were deleted).
+    """
+
+    def __init__(self, path: str = SNAPSHOT_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def sync(self, library, libtype: Optional[str] = None) -> int:
+        """Bring the snapshot of a library up to date, returns the number of items fetched
+
+        libtype selects a level other than the section's own type, such as the
+        seasons or episodes of a TV library; each level is synced separately.
+        """
+        library_id = _library_id(library, libtype)
+        row = self.conn.execute(
+            "SELECT high_water FROM sync_state WHERE library = ?", (library_id,)
+        ).fetchone()
+
+        if row is None:
+            fetched = self._full_sync(library, library_id, libtype)
+        else:
+            # Plex only compares whole seconds, so step back one to catch same-second edits
+            since = int(row[0] or 0) - 1
+            fetched = self._store(library_id, iter_listing(library, libtype, **{'updatedAt>>': since}))
+            if count_section_items(library, libtype) != self.count(library_id):
+                print("Library contents changed, refreshing the full snapshot...")
+                fetched += self._full_sync(library, library_id, libtype)
+        return fetched
+
+    def count(self, library_id: str) -> int:
+        """Number of items stored for a library"""
+        return self.conn.execute("SELECT COUNT(*) FROM items WHERE library = ?", (library_id,)).fetchone()[0]
+
+    def items(self, library, libtype: Optional[str] = None) -> Iterator[SnapshotItem]:
+        """Yield every stored item of a library level"""
+        cursor = self.conn.execute(
+            "SELECT rating_key, title, type, added_at, updated_at, labels, thumb, parts "
+            "FROM items WHERE library = ? ORDER BY rating_key",
+            (_library_id(library, libtype),)
+        )
+        for key, title, libtype, added_at, updated_at, labels, thumb, parts in cursor:
+            yield SnapshotItem(key, title, libtype, added_at, updated_at, json.loads(labels), thumb, json.loads(parts))
+
+    def items_with_labels(self, library, labels: Iterable[str], libtype: Optional[str] = None) -> List[SnapshotItem]:
+        """Get the stored items carrying any of the given labels (case-insensitive)"""
+        wanted = {label.lower() for label in labels}
+        return [
+            item for item in self.items(library, libtype)
+            if any(label.lower() in wanted for label in item.labels)
+        ]
+
+    def default_poster_thumbs(self, library) -> Dict[int, str]:
+        """Get the thumbs items had when their poster was last seen at the default"""
+        return dict(self.conn.execute(
+            "SELECT rating_key, thumb FROM default_posters WHERE library = ?", (str(library.key),)
+        ))
+
+    def record_default_posters(self, library, thumbs: List[Tuple[int, str]]) -> None:
+        """Remember (ratingKey, thumb) pairs for items already at their default poster"""
+        library_id = str(library.key)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO default_posters VALUES (?, ?, ?)",
+                [(library_id, key, thumb) for key, thumb in thumbs]
+            )
+
+    def _full_sync(self, library, library_id: str, libtype: Optional[str] = None) -> int:
+        with self.conn:
+            self.conn.execute("DELETE FROM items WHERE library = ?", (library_id,))
+        return self._store(library_id, iter_listing(library, libtype))
+
+    def _store(self, library_id: str, items: Iterable[Any]) -> int:
+        fetched = 0
+        high_water = self.conn.execute(
+            "SELECT high_water FROM sync_state WHERE library = ?", (library_id,)
+        ).fetchone()
+        high_water = high_water[0] if high_water else 0
+        batch = []
+        for item in items:
+            row = _item_row(library_id, item)
+            high_water = max(high_water or 0, row[5] or 0)
+            batch.append(row)
+            fetched += 1
+            if len(batch) >= 500:
+                self._write(batch)
+                batch = []
+        self._write(batch)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state (library, high_water, synced_at) VALUES (?, ?, ?)",
+                (library_id, high_water, time.time())
+            )
+        return fetched
+
+    def _write(self, rows: List[tuple]) -> None:
+        if rows:
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
@@ -0,0 +1,161 @@
+import contextvars
+import threading
+import time
+from queue import Queue
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from plexapi.utils import joinArgs, searchType
+from operations.governor import track_waits
+
+PAGE_SIZE = 200
+
+SHOW_LEVELS = ['show', 'season', 'episode']
+
+_DONE = object()
+
+def _listing_items(page):
+    """Yield listed items with plexapi's lazy reload on empty fields turned off
+
+    Operations work from listing data, and an empty label or genre list would
+    otherwise trigger a full reload of that item.
+    """
+    for item in page:
+        item._autoReload = False
+        yield item
+
+def count_section_items(library, libtype: Optional[str] = None, **filters) -> int:
+    """Get the server-side item count of a library section without fetching any items"""
+    args = dict(filters)
+    args['type'] = searchType(libtype or library.TYPE)
+    args['X-Plex-Container-Start'] = 0
+    args['X-Plex-Container-Size'] = 0
+    data = library._server.query(f"/library/sections/{library.key}/all{joinArgs(args)}")
+    return int(data.attrib.get('totalSize', data.attrib.get('size', 0)))
+
+def iter_section_query(library, libtype: Optional[str] = None, page_size: int = PAGE_SIZE, **filters) -> Iterator[Any]:
+    """Yield library items matching raw Plex filter arguments one page at a time
+
+    Filters are passed to the server as-is (e.g. ``**{'updatedAt>>': 1700000000}``),
+    which allows operators on fields that plexapi's search does not validate.
+    """
+    args = dict(filters)
+    args['type'] = searchType(libtype or library.TYPE)
+    key = f"/library/sections/{library.key}/all{joinArgs(args)}"
+    start = 0
+    while True:
+        page = library.fetchItems(key, container_start=start, container_size=page_size, maxresults=page_size)
+        yield from _listing_items(page)
+        if len(page) < page_size:
+            break
+        start += page_size
+
+def iter_section_items(library, page_size: int = PAGE_SIZE, **search_kwargs) -> Iterator[Any]:
+    """Yield library items one page at a time using container start/size paging"""
+    start = 0
+    while True:
+        page = library.search(
+            container_start=start,
+            container_size=page_size,
+            maxresults=page_size,
+            **search_kwargs
+        )
+        yield from _listing_items(page)
+        if len(page) < page_size:
+            break
+        start += page_size
+
+def section_levels(library, hierarchical: bool = False) -> List[str]:
+    """Get the item types an operation walks in a library, one flat listing each
+
+    TV sections only list shows by default. With hierarchical set, seasons and
+    episodes are listed too, each with its own type-filtered section listing
+    rather than per-show and per-season child requests.
+    """
+    if hierarchical and library.TYPE == 'show':
+        return list(SHOW_LEVELS)
+    return [library.TYPE]
+
+def iter_section_levels(library, levels: List[str], page_size: int = PAGE_SIZE, **search_kwargs) -> Iterator[Any]:
+    """Yield the items of every level in turn as one stream"""
+    for libtype in levels:
+        yield from iter_section_items(library, page_size, libtype=libtype, **search_kwargs)
+
+def stream_process(items: Iterable[Any],
+                   process_item: Callable[[Any, int], Dict[str, int]],
+                   worker_count: int,
+                   queue_size: Optional[int] = None,
+                   controller=None) -> Iterator[Dict[str, int]]:
+    """Process items on worker threads while the item source is still being read
+
+    A feeder thread pulls items into a bounded work queue so workers can start
+    on the first page while later pages are still loading. Results are yielded
+    on the calling thread as each item completes.
+
+    When a concurrency controller is given, one thread is started per slot up
+    to its ceiling and each item waits for a slot before it is processed.
+    Each item's latency, less any wait for the request governor, is fed back
+    to the controller.
+    """
+    if controller:
+        worker_count = controller.ceiling
+    work = Queue(maxsize=queue_size or worker_count * 4)
+    results = Queue()
+    stop = threading.Event()
+
+    def feed():
+        try:
+            for index, item in enumerate(items, 1):
+                work.put((index, item))
+                if stop.is_set():
+                    break
+        except Exception as e:
+            results.put(e)
+        finally:
+            for _ in range(worker_count):
+                work.put(_DONE)
+
+    def work_loop():
+        while True:
+            entry = work.get()
+            if entry is _DONE:
+                break
+            if stop.is_set():
+                continue
+            index, item = entry
+            if controller and not controller.acquire(stop):
+                continue
+            started = time.monotonic()
+            waits = track_waits()
+            result = None
+            try:
+                result = process_item(item, index)
+                results.put(result)
+            except Exception as e:
+                results.put(e)
+            finally:
+                if controller:
+                    # Time spent waiting on the governor's rate limit is not server latency
+                    failed = result is None or bool(result.get("errors"))
+                    controller.release(max(0.0, time.monotonic() - started - waits[0]), failed)
+        results.put(_DONE)
+
+    # Each thread runs in a copy of the caller's context, so requests count toward the caller's operation
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(feed,), daemon=True)]
+    threads += [threading.Thread(target=contextvars.copy_context().run, args=(work_loop,), daemon=True)
+                for _ in range(worker_count)]
+    for thread in threads:
+        thread.start()
+
+    finished = 0
+    try:
+        while finished < worker_count:
+            result = results.get()
+            if result is _DONE:
+                finished += 1
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                yield result
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
@@ -1,19 +1,22 @@
 import asyncio
-import inquirer
 from config.config_manager import ConfigManager
-from config.setup_wizard import SetupWizard
-from operations.operations import cleanup_labels_operation, reset_posters_operation, delete_recent_movies_operation
-from utils.utils import clear_screen, connect_to_plex
+from utils.session import PlexSession
+from utils.utils import clear_screen, confirm_action, print_operation_header
+
+# plexapi, inquirer and the operations are imported where first needed, so the
+# menu comes up quickly while the session connects in the background
 
 class PlexMaintenanceTool:
     def __init__(self):
         self.config_manager = ConfigManager()
-        self.setup_wizard = SetupWizard(self.config_manager)
+        self.session = PlexSession(self.config_manager.config["plex"]["url"],
+                                   self.config_manager.config["plex"]["token"])
 
     async def run(self):
         """Main application loop"""
         if self.config_manager.needs_setup():
-            await self.setup_wizard.run_setup()
+            await self._run_setup()
+        self.session.warm_up()
 
         while True:
             clear_screen()
@@ -25,14 +28,26 @@ class PlexMaintenanceTool:
             if action:
                 await self._handle_action(action)
 
+    async def _run_setup(self):
+        """Run the setup wizard on the shared session"""
+        from config.setup_wizard import SetupWizard
+        await SetupWizard(self.config_manager, self.session).run_setup()
+
     async def _show_main_menu(self):
         """Display main menu and get user selection"""
+        import inquirer
         questions = [
             inquirer.List('action',
                 message="Select an operation",
                 choices=[
                     ('Clean Up Labels', 'cleanup_labels'),
                     ('Reset Posters', 'reset_posters'),
+                    ('Bulk Label', 'bulk_label'),
+                    ('Find Incomplete Metadata', 'find_incomplete'),
+                    ('Verify Release Dates', 'verify_dates'),
+                    ('Find Abnormal Runtimes', 'find_abnormal'),
+                    ('Verify Media Paths', 'verify_paths'),
+                    ('Verify Media Integrity', 'verify_integrity'),
                     ('Reconfigure Settings', 'reconfigure'),
                     ('Exit', 'exit')
                 ])
@@ -43,6 +58,7 @@ class PlexMaintenanceTool:
 
     async def _select_library(self):
         """Display library selection menu"""
+        import inquirer
         libraries = self.config_manager.get_libraries()
         
         questions = [
@@ -56,6 +72,7 @@ class PlexMaintenanceTool:
 
     async def _get_bulk_label_criteria(self):
         """Get criteria for bulk label operation"""
+        import inquirer
         questions = [
             inquirer.List('criteria_type',
                 message="Select criteria type",
@@ -81,38 +98,88 @@ class PlexMaintenanceTool:
     async def _handle_action(self, action):
         """Handle selected action"""
         if action == 'reconfigure':
-            await self.setup_wizard.run_setup()
+            await self._run_setup()
             return
 
         library = await self._select_library()
         if not library:
             return
 
-        # Get Plex connection details from config
-        plex_url = self.config_manager.config["plex"]["url"]
-        plex_token = self.config_manager.config["plex"]["token"]
+        from operations.operations import (
+            cleanup_labels_operation, reset_posters_operation,
+            find_abnormal_runtimes, verify_media_paths, verify_media_integrity, bulk_label_operation,
+            find_incomplete_metadata, verify_release_dates
+        )
+        from operations.governor import create_governor
+        from operations.journal import CheckpointJournal
+        from operations.metrics import RequestMetrics, RunProfiler
+        from operations.snapshot import MetadataSnapshot
+
         worker_count = self.config_manager.get_worker_count()
+        concurrency = self.config_manager.get_concurrency_settings()
+        load_limits = self.config_manager.get_load_settings()
         
-        plex = connect_to_plex(plex_url, plex_token)
+        # Reuses the session's connection, which stays open between actions
+        plex = self.session.server()
         if not plex:
             input("Press Enter to continue...")
             return
 
+        diagnostics = self.config_manager.get_diagnostics_settings()
+        metrics = RequestMetrics() if diagnostics["metrics"] else None
+        if metrics:
+            # Installed under the governor so each retry is timed on its own
+            metrics.install(plex)
+        governor = create_governor(self.config_manager.get_governor_settings())
+        if governor:
+            governor.install(plex)
+        profiler = RunProfiler(action, library) if diagnostics["profile"] else None
+        if profiler:
+            profiler.start()
+        summary = None
+
         try:
             if action == 'cleanup_labels':
-                await cleanup_labels_operation(
-                    plex, 
-                    library, 
-                    worker_count,
-                    self.config_manager.get_preserve_labels()
-                )
+                snapshot = MetadataSnapshot() if self.config_manager.use_snapshot() else None
+                try:
+                    summary = await cleanup_labels_operation(
+                        plex, 
+                        library, 
+                        worker_count,
+                        self.config_manager.get_preserve_labels(),
+                        concurrency=concurrency,
+                        load_limits=load_limits,
+                        snapshot=snapshot,
+                        governor=governor,
+                        hierarchical=self.config_manager.use_tv_hierarchy()
+                    )
+                finally:
+                    if snapshot:
+                        snapshot.close()
                 
             elif action == 'reset_posters':
-                await reset_posters_operation(
-                    plex,
-                    library,
-                    worker_count
+                resume = (
+                    CheckpointJournal.has_unfinished("Poster Reset", library)
+                    and confirm_action("\nA previous poster reset was interrupted. Resume it?")
                 )
+                snapshot = MetadataSnapshot() if self.config_manager.use_snapshot() else None
+                try:
+                    summary = await reset_posters_operation(
+                        plex,
+                        library,
+                        worker_count,
+                        concurrency=concurrency,
+                        load_limits=load_limits,
+                        resume=resume,
+                        snapshot=snapshot,
+                        use_async=self.config_manager.use_async_http(),
+                        governor=governor,
+                        hierarchical=self.config_manager.use_tv_hierarchy(),
+                        metrics=metrics
+                    )
+                finally:
+                    if snapshot:
+                        snapshot.close()
                 
             elif action == 'verify_dates':
                 print_operation_header("Release Date Verification", library)
@@ -144,7 +211,7 @@ class PlexMaintenanceTool:
                     
             elif action == 'verify_paths':
                 print_operation_header("Media Path Verification", library)
-                issues = await verify_media_paths(plex, library)
+                issues = await verify_media_paths(plex, library, self.config_manager.get_path_mappings())
                 
                 if issues:
                     print("\nMedia path issues found:")
@@ -158,7 +225,7 @@ class PlexMaintenanceTool:
                     
             elif action == 'verify_integrity':
                 print_operation_header("Media Integrity Check", library)
-                issues = await verify_media_integrity(plex, library, worker_count)
+                issues = await verify_media_integrity(plex, library, worker_count, self.config_manager.get_path_mappings())
                 
                 if issues:
                     print("\nMedia integrity issues found:")
@@ -218,11 +285,26 @@ class PlexMaintenanceTool:
                 else:
                     print("\nOperation cancelled.")
             
+            self._finish_diagnostics(action, library, profiler, metrics, summary)
             input("\nOperation complete. Press Enter to continue...")
             
         except Exception as e:
+            self._finish_diagnostics(action, library, profiler, metrics, summary)
             print(f"\nError during operation: {e}")
             input("Press Enter to continue...")
+        finally:
+            # The connection outlives the action, so take the request hooks off it
+            if governor:
+                governor.uninstall(plex)
+            if metrics:
+                metrics.uninstall(plex)
+
+    def _finish_diagnostics(self, action, library, profiler, metrics, summary):
+        """Stop profiling and export the run's request metrics"""
+        if profiler:
+            profiler.stop()
+        if metrics:
+            metrics.export(action, library, summary, self.config_manager.get_diagnostics_settings()["textfile_dir"] or None)
 
 if __name__ == "__main__":
     tool = PlexMaintenanceTool()
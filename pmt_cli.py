@@ -0,0 +1,352 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from config.config_manager import ConfigManager
+from operations.concurrency import create_controller
+from operations.governor import create_governor
+from operations.load_monitor import create_load_monitor
+from operations.metrics import RequestMetrics, RunProfiler
+from operations.operations import (
+    cleanup_labels_operation, reset_posters_operation, delete_recent_movies_operation,
+    find_abnormal_runtimes, verify_media_paths, verify_media_integrity, bulk_label_operation,
+    find_incomplete_metadata, verify_release_dates, plan_label_cleanup_operation, plan_poster_reset_operation,
+    plan_recent_deletes_operation, apply_plan_operation
+)
+from operations.plans import MutationPlan
+from operations.scheduler import MaintenanceScheduler
+from operations.snapshot import MetadataSnapshot
+from utils.utils import connect_to_plex, confirm_action
+
+EXIT_OK = 0
+EXIT_ITEM_ERRORS = 1
+EXIT_FAILED = 2
+
+MUTATING_COMMANDS = {'cleanup-labels', 'reset-posters', 'delete-recent', 'bulk-label', 'apply'}
+
+PLAN_COMMANDS = {'plan-labels', 'plan-posters', 'plan-deletes'}
+
+def _build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    target = common.add_mutually_exclusive_group(required=True)
+    target.add_argument('--library', action='append', dest='libraries', metavar='NAME',
+                        help="Library to process, can be repeated")
+    target.add_argument('--all-libraries', action='store_true',
+                        help="Process every library configured in config.json")
+    common.add_argument('--yes', action='store_true',
+                        help="Do not ask for confirmation before changing anything")
+    common.add_argument('--budget', type=int, metavar='N',
+                        help="Requests in flight across all libraries (default: the processing mode's ceiling)")
+    common.add_argument('--parallel', type=int, default=2, metavar='N',
+                        help="Libraries processed at the same time (default: 2)")
+    common.add_argument('--json', dest='json_path', metavar='PATH',
+                        help="Write the JSON summary to a file instead of stdout")
+
+    parser = argparse.ArgumentParser(
+        description="Run Plex Maintenance Tool operations without the interactive menus"
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('cleanup-labels', parents=[common], help="Remove labels not in preserve_labels")
+    reset = commands.add_parser('reset-posters', parents=[common], help="Reset posters to their defaults")
+    reset.add_argument('--resume', action='store_true', help="Resume an interrupted poster reset")
+    delete = commands.add_parser('delete-recent', parents=[common], help="Delete items added recently")
+    delete.add_argument('--hours', type=int, default=48, help="Delete items added in the last N hours (default: 48)")
+    delete.add_argument('--empty-trash', action='store_true', help="Empty the library trash afterwards")
+    delete.add_argument('--refresh', action='store_true', help="Scan the library afterwards")
+    bulk = commands.add_parser('bulk-label', parents=[common], help="Label every item matching a criterion")
+    bulk.add_argument('--criteria', required=True, metavar='TYPE=VALUE',
+                      help="resolution, codec, genre, year or rating, e.g. genre=Horror")
+    bulk.add_argument('--label', required=True, help="Label to apply")
+    commands.add_parser('find-incomplete', parents=[common], help="Find items with incomplete metadata")
+    commands.add_parser('verify-dates', parents=[common], help="Find release date conflicts")
+    commands.add_parser('find-abnormal', parents=[common], help="Find abnormal runtimes")
+    commands.add_parser('verify-paths', parents=[common], help="Check media files exist on disk")
+    commands.add_parser('verify-integrity', parents=[common], help="Check media container structure")
+    plan_labels = commands.add_parser('plan-labels', parents=[common], help="Plan a label cleanup without changing anything")
+    plan_posters = commands.add_parser('plan-posters', parents=[common], help="Plan a poster reset without changing anything")
+    plan_deletes = commands.add_parser('plan-deletes', parents=[common], help="Plan a recent deletion without changing anything")
+    plan_deletes.add_argument('--hours', type=int, default=48, help="Delete items added in the last N hours (default: 48)")
+    plan_deletes.add_argument('--empty-trash', action='store_true', help="Empty the library trash after applying")
+    plan_deletes.add_argument('--refresh', action='store_true', help="Scan the library after applying")
+    for plan_parser in (plan_labels, plan_posters, plan_deletes):
+        plan_parser.add_argument('--out', metavar='DIR', help="Directory to write plans to (default: plans)")
+    apply = commands.add_parser('apply', help="Apply saved plans")
+    apply.add_argument('plans', nargs='+', metavar='PLAN', help="Plan files written by a plan command")
+    apply.add_argument('--dry-run', action='store_true', help="Only show what the plans would change")
+    apply.add_argument('--yes', action='store_true', help="Do not ask for confirmation before changing anything")
+    apply.add_argument('--budget', type=int, metavar='N', help="Requests in flight across all plans")
+    apply.add_argument('--parallel', type=int, default=2, metavar='N', help="Plans applied at the same time (default: 2)")
+    apply.add_argument('--json', dest='json_path', metavar='PATH',
+                       help="Write the JSON summary to a file instead of stdout")
+    commands.add_parser('daemon', help="Run the jobs in config.json's schedule inside its off-peak windows")
+    return parser
+
+def _to_json(value: Any) -> Any:
+    """Fallback for values json cannot encode: dates and plexapi items"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'title'):
+        return value.title
+    return str(value)
+
+def _issue_json(issue: Dict[str, Any]) -> Dict[str, Any]:
+    """An issue with its item reduced to ratingKey and title, whatever kind of item it was"""
+    item = issue['item']
+    return {**issue, 'item': {"ratingKey": item.ratingKey, "title": item.title}}
+
+class HeadlessRunner:
+    """Run one operation over several libraries with a shared connection and request budget
+
+    Libraries run on their own threads, up to ``parallel`` at once. All of
+    them share one Plex connection, one request governor and one concurrency
+    controller, so the budget bounds requests in flight across every library
+    rather than per library. A single load monitor drives that controller.
+    The apply command runs plan files the same way, one per library.
+    """
+
+    def __init__(self, config_manager: ConfigManager, args: argparse.Namespace):
+        self.config_manager = config_manager
+        self.args = args
+
+    def run(self) -> Dict[str, Any]:
+        """Run the command over every selected library, returns the JSON summary"""
+        if self.args.command == 'apply':
+            libraries = self.args.plans
+        else:
+            libraries = self.config_manager.get_libraries() if self.args.all_libraries else self.args.libraries
+        summary: Dict[str, Any] = {"command": self.args.command, "libraries": []}
+        if not libraries:
+            summary.update(status="failed", error="No libraries selected")
+            return summary
+
+        plex = connect_to_plex(self.config_manager.config["plex"]["url"], self.config_manager.config["plex"]["token"])
+        if not plex:
+            summary.update(status="failed", error="Could not connect to the Plex server")
+            return summary
+
+        diagnostics = self.config_manager.get_diagnostics_settings()
+        metrics = RequestMetrics() if diagnostics["metrics"] else None
+        if metrics:
+            metrics.install(plex)
+        governor = create_governor(self.config_manager.get_governor_settings())
+        if governor:
+            governor.install(plex)
+        run_name = ", ".join(os.path.splitext(os.path.basename(library))[0] for library in libraries)
+        profiler = RunProfiler(self.args.command, run_name) if diagnostics["profile"] else None
+        concurrency = self.config_manager.get_concurrency_settings()
+        budget = max(1, self.args.budget or concurrency["ceiling"])
+        concurrency.update(ceiling=budget, start=min(concurrency["start"], budget))
+        controller = create_controller(budget, concurrency)
+        monitor = create_load_monitor(plex, controller, self.config_manager.get_load_settings())
+        parallel = max(1, min(self.args.parallel, len(libraries)))
+        if self.args.command == 'delete-recent' and not self.args.yes:
+            # Each library lists its candidates and asks before deleting, one prompt at a time
+            parallel = 1
+
+        if profiler:
+            profiler.start()
+        if monitor:
+            monitor.start()
+        try:
+            with ThreadPoolExecutor(max_workers=parallel) as executor:
+                futures = [
+                    executor.submit(self._run_library, plex, library, controller, governor, metrics,
+                                    max(1, budget // parallel))
+                    for library in libraries
+                ]
+                summary["libraries"] = [future.result() for future in futures]
+        finally:
+            if monitor:
+                monitor.stop()
+            if profiler:
+                profiler.stop()
+            if governor:
+                governor.uninstall(plex)
+            if metrics:
+                metrics.uninstall(plex)
+                metrics.export(self.args.command, run_name, textfile_dir=diagnostics["textfile_dir"] or None)
+                summary["endpoints"] = metrics.to_json()
+
+        if governor:
+            summary["requests"] = dict(governor.counts)
+        if monitor:
+            summary["load_seconds"] = dict(monitor.seconds)
+        failed = [result for result in summary["libraries"] if result["status"] == "failed"]
+        summary["status"] = "failed" if failed else "ok"
+        return summary
+
+    def _run_library(self, plex, library: str, controller, governor, metrics, worker_count: int) -> Dict[str, Any]:
+        try:
+            result = asyncio.run(self._run_operation(plex, library, controller, governor, metrics, worker_count))
+            return {"library": library, "status": "ok", **result}
+        except Exception as e:
+            print(f"\nError during operation on {library}: {e}")
+            return {"library": library, "status": "failed", "error": str(e)}
+
+    async def _run_operation(self, plex, library: str, controller, governor, metrics,
+                             worker_count: int) -> Dict[str, Any]:
+        args = self.args
+        config = self.config_manager
+        command = args.command
+
+        if command in ('cleanup-labels', 'reset-posters'):
+            snapshot = MetadataSnapshot() if config.use_snapshot() else None
+            try:
+                if command == 'cleanup-labels':
+                    summary = await cleanup_labels_operation(
+                        plex, library, worker_count, config.get_preserve_labels(),
+                        snapshot=snapshot, governor=governor,
+                        hierarchical=config.use_tv_hierarchy(), controller=controller
+                    )
+                else:
+                    summary = await reset_posters_operation(
+                        plex, library, worker_count, resume=args.resume, snapshot=snapshot,
+                        use_async=config.use_async_http(), governor=governor,
+                        hierarchical=config.use_tv_hierarchy(), controller=controller, metrics=metrics
+                    )
+            finally:
+                if snapshot:
+                    snapshot.close()
+            return {"summary": summary or {}}
+
+        if command in PLAN_COMMANDS:
+            snapshot = MetadataSnapshot() if config.use_snapshot() and command != 'plan-deletes' else None
+            try:
+                if command == 'plan-labels':
+                    plan = await plan_label_cleanup_operation(
+                        plex, library, config.get_preserve_labels(), snapshot=snapshot,
+                        hierarchical=config.use_tv_hierarchy()
+                    )
+                elif command == 'plan-posters':
+                    plan = await plan_poster_reset_operation(
+                        plex, library, worker_count, snapshot=snapshot,
+                        hierarchical=config.use_tv_hierarchy(), controller=controller
+                    )
+                else:
+                    plan = await plan_recent_deletes_operation(plex, library, args.hours, args.empty_trash, args.refresh)
+            finally:
+                if snapshot:
+                    snapshot.close()
+            path = plan.save(os.path.join(args.out, os.path.basename(plan.default_path())) if args.out else None)
+            plan.review()
+            print(f"Plan written to {path}")
+            return {"summary": {**plan.summary, **plan.counts()}, "plan": path}
+
+        if command == 'apply':
+            plan = MutationPlan.load(library)
+            summary = await apply_plan_operation(plex, plan, worker_count, governor=governor, controller=controller)
+            return {"library": plan.library, "plan": library, "summary": summary or {}}
+
+        if command == 'delete-recent':
+            summary = await delete_recent_movies_operation(
+                plex, library, args.hours, worker_count, empty_trash=args.empty_trash,
+                refresh=args.refresh, governor=governor, controller=controller, assume_yes=args.yes
+            )
+            return {"summary": summary or {}}
+
+        if command == 'bulk-label':
+            criteria_type, _, value = args.criteria.partition('=')
+            results = await bulk_label_operation(plex, library, worker_count, {criteria_type: value}, args.label)
+            errors = [_issue_json(result) for result in results if 'error' in result]
+            return {"summary": {"labeled": len(results) - len(errors), "errors": len(errors)}, "issues": errors}
+
+        if command == 'find-abnormal':
+            results = await find_abnormal_runtimes(plex, library, worker_count)
+            issues = results['movies'] + results['episodes']
+        elif command == 'find-incomplete':
+            issues = await find_incomplete_metadata(plex, library, worker_count)
+        elif command == 'verify-dates':
+            issues = await verify_release_dates(plex, library, worker_count)
+        elif command == 'verify-paths':
+            issues = await verify_media_paths(plex, library, config.get_path_mappings())
+        else:
+            issues = await verify_media_integrity(plex, library, worker_count, config.get_path_mappings())
+        return {"summary": {"issues": len(issues)}, "issues": [_issue_json(issue) for issue in issues]}
+
+def exit_status(summary: Dict[str, Any]) -> int:
+    """0 when everything succeeded, 1 when some items failed, 2 when an operation failed"""
+    if summary["status"] == "failed":
+        return EXIT_FAILED
+    if any(result["summary"].get("errors") for result in summary["libraries"]):
+        return EXIT_ITEM_ERRORS
+    return EXIT_OK
+
+def run_daemon(config_manager: ConfigManager) -> int:
+    """Run the scheduler on one long-lived connection until interrupted"""
+    plex = connect_to_plex(config_manager.config["plex"]["url"], config_manager.config["plex"]["token"])
+    if not plex:
+        return EXIT_FAILED
+    try:
+        scheduler = MaintenanceScheduler(plex, config_manager)
+    except (KeyError, ValueError) as e:
+        print(f"Invalid schedule: {e}", file=sys.stderr)
+        return EXIT_FAILED
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        print("\nScheduler stopped")
+    return EXIT_OK
+
+def review_plans(args: argparse.Namespace) -> int:
+    """Print what each plan would change, without connecting to the server"""
+    summary: Dict[str, Any] = {"command": "apply", "dry_run": True, "plans": []}
+    status = EXIT_OK
+    for path in args.plans:
+        try:
+            plan = MutationPlan.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not read plan {path}: {e}", file=sys.stderr)
+            summary["plans"].append({"plan": path, "status": "failed", "error": str(e)})
+            status = EXIT_FAILED
+            continue
+        with contextlib.redirect_stdout(sys.stderr):
+            plan.review()
+        summary["plans"].append({"plan": path, "status": "ok", "operation": plan.operation,
+                                 "library": plan.library, "counts": plan.counts()})
+    summary["exit_status"] = status
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(summary, f, indent=4)
+    else:
+        print(json.dumps(summary, indent=4))
+    return status
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _build_parser().parse_args(argv)
+    config_manager = ConfigManager()
+    if config_manager.needs_setup():
+        print("Not configured yet, run pmt.py once to set up the Plex connection", file=sys.stderr)
+        return EXIT_FAILED
+
+    if args.command == 'daemon':
+        return run_daemon(config_manager)
+
+    if args.command == 'apply' and args.dry_run:
+        return review_plans(args)
+
+    # Headers, listings and progress go to stderr, so stdout only carries the JSON summary
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.command in MUTATING_COMMANDS and not args.yes:
+            if not sys.stdin.isatty():
+                print(f"'{args.command}' changes the library, pass --yes to run it unattended")
+                return EXIT_FAILED
+            # delete-recent lists what it found and asks for itself
+            if args.command != 'delete-recent' and not confirm_action(f"Run {args.command} now?"):
+                return EXIT_OK
+
+        summary = HeadlessRunner(config_manager, args).run()
+    status = exit_status(summary)
+    summary["exit_status"] = status
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(summary, f, indent=4, default=_to_json)
+    else:
+        print(json.dumps(summary, indent=4, default=_to_json))
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,80 @@
+import asyncio
+import contextvars
+import json
+from operations.events import EventBus
+from operations.governor import RequestGovernor, track_counts
+from operations.streaming import stream_process
+
+class Flaky:
+    """Fail with a 503 the given number of times, then succeed"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+
+    def __call__(self):
+        if self.failures:
+            self.failures -= 1
+            raise Exception("(503) service unavailable")
+        return "ok"
+
+def governor() -> RequestGovernor:
+    return RequestGovernor(requests_per_second=1000, burst=1000, backoff_base=0, backoff_max=0)
+
+def run_job(shared: RequestGovernor, failures: int):
+    # Each scheduled job runs under asyncio.run, so it gets a fresh copy of the context
+    async def job():
+        counts = track_counts()
+        shared.call(Flaky(failures))
+        return dict(counts)
+    return asyncio.run(job())
+
+def test_jobs_sharing_a_governor_count_only_their_own_retries():
+    shared = governor()
+    first = run_job(shared, 2)
+    second = run_job(shared, 1)
+    third = run_job(shared, 0)
+    assert first["retries"] == 2
+    assert second["retries"] == 1
+    assert third["retries"] == 0
+    assert shared.counts["retries"] == 3
+
+def test_worker_threads_count_toward_the_caller():
+    shared = governor()
+
+    def operation():
+        counts = track_counts()
+        results = list(stream_process(range(8), lambda item, index: {"value": shared.call(Flaky(1))}, 4))
+        return counts, results
+
+    counts, results = contextvars.copy_context().run(operation)
+    assert len(results) == 8
+    assert counts["retries"] == 8
+    assert counts["requests"] == 16
+
+def test_default_settings_retry_without_a_rate_limit():
+    from config.config_manager import DEFAULT_CONFIG
+    from operations.governor import create_governor
+    default = create_governor(DEFAULT_CONFIG["processing"]["governor"])
+    assert default is not None
+    assert default.max_retries > 0
+    assert all(default._wait_time() == 0 for _ in range(1000))
+
+def test_rate_limit_makes_callers_wait():
+    limited = RequestGovernor(requests_per_second=10, burst=2)
+    waits = [limited._wait_time() for _ in range(4)]
+    assert waits[:2] == [0, 0]
+    assert 0.05 < waits[2] <= 0.1 < waits[3] <= 0.2
+
+def test_breaker_trips_are_reported_through_open_event_buses(tmp_path, capsys):
+    shared = RequestGovernor(backoff_base=0, backoff_max=0, breaker_threshold=1, breaker_cooldown=0)
+    buses = [EventBus("Poster Reset", name, 1, directory=str(tmp_path), live=False) for name in ("A", "B")]
+    shared.call(Flaky(1))
+    for bus in buses:
+        bus.close()
+    notices = []
+    for bus in buses:
+        with open(bus.path) as f:
+            notices.append(json.loads(f.readlines()[1]))
+    assert [notice["event"] for notice in notices] == ["message", "notice"]
+    assert all(notice["message"].startswith("Too many consecutive failures") for notice in notices)
+    assert capsys.readouterr().out.count("Too many consecutive failures") == 1
@@ -0,0 +1,130 @@
+import os
+import struct
+import pytest
+from operations.integrity import (
+    CLUSTER, CUES, DURATION, EBML_HEADER, INFO, SEEK, SEEK_HEAD, SEEK_ID, SEEK_POSITION,
+    SEGMENT, TIMESTAMP_SCALE, check_container
+)
+
+def box(box_type: bytes, payload: bytes = b'') -> bytes:
+    return struct.pack('>I', 8 + len(payload)) + box_type + payload
+
+def mvhd(timescale: int, duration: int) -> bytes:
+    return box(b'mvhd', b'\x00' * 12 + struct.pack('>II', timescale, duration) + b'\x00' * 80)
+
+def mp4_file(mdat_size: int = 64) -> bytes:
+    return (box(b'ftyp', b'isom\x00\x00\x02\x00')
+            + box(b'moov', mvhd(1000, 90000))
+            + box(b'mdat', b'\x00' * mdat_size))
+
+def element_id(value: int) -> bytes:
+    return value.to_bytes((value.bit_length() + 7) // 8, 'big')
+
+def element(value: int, payload: bytes = b'', unknown_size: bool = False) -> bytes:
+    # Sizes are always written as 8-byte vints so offsets are easy to work out
+    size = b'\x01\xff\xff\xff\xff\xff\xff\xff' if unknown_size else b'\x01' + len(payload).to_bytes(7, 'big')
+    return element_id(value) + size + payload
+
+def seek(target: int, position: int) -> bytes:
+    return element(SEEK, element(SEEK_ID, element_id(target)) + element(SEEK_POSITION, position.to_bytes(8, 'big')))
+
+def mkv_file(duration_ms: float = 90000.0, with_cues: bool = True) -> bytes:
+    info = element(INFO, element(TIMESTAMP_SCALE, (1000000).to_bytes(4, 'big'))
+                   + element(DURATION, struct.pack('>d', duration_ms)))
+    cluster = element(CLUSTER, b'\x00' * 64)
+    cues = element(CUES, b'\x00' * 16)
+    seek_head_size = len(element(SEEK_HEAD, seek(INFO, 0) + seek(CUES, 0)))
+    entries = seek(INFO, seek_head_size)
+    if with_cues:
+        entries += seek(CUES, seek_head_size + len(info) + len(cluster))
+    else:
+        entries += element(0xEC, b'\x00' * (len(seek(CUES, 0)) - 9))
+    body = element(SEEK_HEAD, entries) + info + cluster + cues
+    return element(EBML_HEADER, element(0x4282, b'matroska')) + element(SEGMENT, body)
+
+def write(tmp_path, name: str, data: bytes) -> str:
+    path = os.path.join(tmp_path, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+def test_mp4_valid(tmp_path):
+    result = check_container(write(tmp_path, 'movie.mp4', mp4_file()))
+    assert result == {"problems": [], "duration": 90000.0}
+
+def test_mp4_truncated_inside_mdat(tmp_path):
+    result = check_container(write(tmp_path, 'movie.mp4', mp4_file()[:-10]))
+    assert result["problems"] == ["File truncated inside 'mdat' atom"]
+    assert result["duration"] == 90000.0
+
+def test_mp4_truncated_inside_moov(tmp_path):
+    data = mp4_file()
+    cut = data.index(b'mvhd') + 10
+    result = check_container(write(tmp_path, 'movie.mp4', data[:cut]))
+    assert "File truncated inside 'moov' atom" in result["problems"]
+    assert "Missing mdat atom" in result["problems"]
+    assert result["duration"] is None
+
+def test_mp4_truncated_inside_box_header(tmp_path):
+    data = mp4_file()
+    result = check_container(write(tmp_path, 'movie.mp4', data[:len(box(b'ftyp', b'isom\x00\x00\x02\x00')) + 5]))
+    assert result["problems"] == ["Missing moov atom", "Missing mdat atom"]
+
+def test_mp4_corrupt_box_header(tmp_path):
+    data = mp4_file()
+    moov = data.index(b'moov') - 4
+    corrupt = data[:moov] + struct.pack('>I', 4) + data[moov + 4:]
+    result = check_container(write(tmp_path, 'movie.mp4', corrupt))
+    assert result["problems"][0] == f"Corrupt atom header at offset {moov}"
+
+def test_mkv_valid(tmp_path):
+    result = check_container(write(tmp_path, 'movie.mkv', mkv_file()))
+    assert result == {"problems": [], "duration": 90000.0}
+
+def test_mkv_without_cues(tmp_path):
+    result = check_container(write(tmp_path, 'movie.mkv', mkv_file(with_cues=False)))
+    assert result["problems"] == ["No Cues index referenced (seeking will be slow)"]
+
+def test_mkv_truncated_before_cues(tmp_path):
+    data = mkv_file()
+    result = check_container(write(tmp_path, 'movie.mkv', data[:-len(element(CUES, b'\x00' * 16))]))
+    assert result["problems"] == [
+        "File truncated (segment extends past end of file)",
+        "Cues index points past end of file",
+    ]
+    assert result["duration"] == 90000.0
+
+def test_mkv_truncated_inside_cues(tmp_path):
+    result = check_container(write(tmp_path, 'movie.mkv', mkv_file()[:-4]))
+    assert "File truncated inside Cues index" in result["problems"]
+
+def test_mkv_truncated_after_ebml_header(tmp_path):
+    header = element(EBML_HEADER, element(0x4282, b'matroska'))
+    result = check_container(write(tmp_path, 'movie.mkv', header))
+    assert result["problems"] == ["File truncated after EBML header"]
+
+def test_mkv_truncated_inside_element_header(tmp_path):
+    header = element(EBML_HEADER, element(0x4282, b'matroska'))
+    result = check_container(write(tmp_path, 'movie.mkv', header + element_id(SEGMENT)))
+    assert result["problems"][0].startswith("Unreadable container structure")
+
+def test_mkv_missing_ebml_header(tmp_path):
+    result = check_container(write(tmp_path, 'movie.mkv', b'\x80' * 32))
+    assert result["problems"] == ["Missing EBML header"]
+
+@pytest.mark.parametrize('name', ['movie.mp4', 'movie.mkv'])
+def test_zero_length_file(tmp_path, name):
+    result = check_container(write(tmp_path, name, b''))
+    assert result == {"problems": ["File is empty"], "duration": None}
+
+def test_other_extensions_are_not_checked(tmp_path):
+    result = check_container(write(tmp_path, 'movie.avi', b'RIFF'))
+    assert result == {"problems": [], "duration": None}
+
+def test_unreadable_files_are_reported(tmp_path):
+    os.mkdir(os.path.join(tmp_path, 'folder.mkv'))
+    os.symlink(os.path.join(tmp_path, 'gone.mp4'), os.path.join(tmp_path, 'dangling.mp4'))
+    for name in ('folder.mkv', 'dangling.mp4', 'missing.mp4'):
+        result = check_container(os.path.join(tmp_path, name))
+        assert result["problems"][0].startswith("Cannot read file")
+        assert result["unreadable"]
\ No newline at end of file
@@ -0,0 +1,42 @@
+import os
+from operations.path_scan import PathItem, scan_media_files, stat_files
+
+def test_scan_media_files_reports_missing_unreadable_and_orphan_files(tmp_path):
+    dangling = os.path.join(tmp_path, 'dangling.mkv')
+    os.symlink(os.path.join(tmp_path, 'gone.mkv'), dangling)
+    loop = os.path.join(tmp_path, 'loop.mkv')
+    os.symlink(loop, loop)
+    present = os.path.join(tmp_path, 'present.mkv')
+    with open(present, 'wb') as f:
+        f.write(b'\x00' * 10)
+    with open(os.path.join(tmp_path, 'orphan.mp4'), 'wb') as f:
+        f.write(b'\x00')
+
+    issues = scan_media_files([
+        (PathItem(1, 'Dangling'), dangling, 100),
+        (PathItem(2, 'Present'), present, 20),
+        (PathItem(3, 'Loop'), loop, 100),
+        (PathItem(4, 'Missing'), os.path.join(tmp_path, 'missing.mkv'), None),
+    ])
+    found = {issue['item'].ratingKey: issue['issue'] for issue in issues}
+    assert found.pop(3).startswith("Cannot read file")
+    assert found == {
+        1: "File not found",
+        2: "Size mismatch (Plex: 20 bytes, disk: 10 bytes)",
+        4: "File not found",
+        None: "Orphan file not known to Plex",
+    }
+
+def test_stat_files_reports_missing_and_dangling(tmp_path):
+    present = os.path.join(tmp_path, 'present.mkv')
+    with open(present, 'wb') as f:
+        f.write(b'\x00' * 10)
+    dangling = os.path.join(tmp_path, 'dangling.mkv')
+    os.symlink(os.path.join(tmp_path, 'gone.mkv'), dangling)
+    missing = os.path.join(tmp_path, 'missing.mkv')
+
+    results = stat_files([present, dangling, missing, os.path.join(tmp_path, 'nowhere', 'a.mkv')])
+    assert results[present].st_size == 10
+    assert isinstance(results[dangling], FileNotFoundError)
+    assert isinstance(results[missing], FileNotFoundError)
+    assert isinstance(results[os.path.join(tmp_path, 'nowhere', 'a.mkv')], OSError)
\ No newline at end of file
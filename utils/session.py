@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import namedtuple
+from typing import Any, Dict, List, Optional
+
+SESSION_TTL = 600
+
+SectionInfo = namedtuple('SectionInfo', 'key title type')
+
+class PlexSession:
+    """One Plex connection shared by every action of an interactive run
+
+    The server is connected to once and reused until the TTL runs out, after
+    which the next action reconnects and so picks up libraries added or
+    renamed in the meantime. The server's identity and its section list
+    (key, title and type of each) are cached along with the connection.
+
+    warm_up connects and lists the sections on a background thread,
+    importing plexapi on the way, so both are usually ready by the time the
+    first action is picked from the menu.
+    """
+
+    def __init__(self, url: str, token: str, ttl: float = SESSION_TTL):
+        self.url = url
+        self.token = token
+        self.ttl = ttl
+        self._plex = None
+        self._sections: Optional[List[SectionInfo]] = None
+        self._connected_at = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, url: str, token: str) -> None:
+        """Point the session at a server, dropping the connection if it changed"""
+        with self._lock:
+            if (url, token) != (self.url, self.token):
+                self.url, self.token = url, token
+                self._plex = None
+
+    def warm_up(self) -> None:
+        """Connect in the background without printing anything"""
+        threading.Thread(target=self._warm_up, daemon=True).start()
+
+    def connect(self, url: str, token: str):
+        """Connect to a server, e.g. to test new settings, returns the server or None"""
+        self.configure(url, token)
+        return self.server()
+
+    def server(self):
+        """Get the shared PlexServer, connecting first if needed, or None if that fails"""
+        with self._lock:
+            if self._plex is None or time.monotonic() - self._connected_at > self.ttl:
+                self._connect(quiet=False)
+            return self._plex
+
+    def identity(self) -> Dict[str, Any]:
+        """Get the connected server's name, machine identifier and version"""
+        plex = self.server()
+        if not plex:
+            return {}
+        return {"name": plex.friendlyName, "machineIdentifier": plex.machineIdentifier, "version": plex.version}
+
+    def sections(self) -> List[SectionInfo]:
+        """Get the key, title and type of every library section"""
+        self.server()
+        with self._lock:
+            if self._plex and self._sections is None:
+                self._load_sections()
+            return list(self._sections or [])
+
+    def _warm_up(self) -> None:
+        with self._lock:
+            if self._plex is None:
+                self._connect(quiet=True)
+            if self._plex and self._sections is None:
+                try:
+                    self._load_sections()
+                except Exception:
+                    # Left for the first action to load and report
+                    pass
+
+    def _load_sections(self) -> None:
+        # Called with the lock held, also primes plexapi's own section lookup
+        self._sections = [SectionInfo(section.key, section.title, section.type)
+                          for section in self._plex.library.sections()]
+
+    def _connect(self, quiet: bool) -> None:
+        # Called with the lock held
+        from plexapi.server import PlexServer
+        self._plex = None
+        self._sections = None
+        try:
+            if not quiet:
+                print("\nConnecting to Plex server...")
+            self._plex = PlexServer(self.url, self.token)
+            self._connected_at = time.monotonic()
+            if not quiet:
+                print(f"Connected to: {self._plex.friendlyName}")
+        except Exception as e:
+            if not quiet:
+                print(f"Connection failed: {e}")
\ No newline at end of file
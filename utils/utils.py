@@ -1,6 +1,8 @@
 import os
-from plexapi.server import PlexServer
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from plexapi.server import PlexServer
 
 def clear_screen():
     """Clear the console screen"""
@@ -17,8 +19,9 @@ def print_banner():
 """
     print(banner)
 
-def connect_to_plex(url: str, token: str) -> Optional[PlexServer]:
+def connect_to_plex(url: str, token: str) -> Optional["PlexServer"]:
     """Connect to Plex server"""
+    from plexapi.server import PlexServer
     try:
         print("\nConnecting to Plex server...")
         plex = PlexServer(url, token)
@@ -28,13 +31,14 @@ def connect_to_plex(url: str, token: str) -> Optional[PlexServer]:
         print(f"Connection failed: {e}")
         return None
 
-def format_progress_bar(current: int, total: int, width: int = 40) -> str:
+def format_progress_bar(current: int, total: int, width: int = 40, workers: Optional[int] = None) -> str:
     """Create a progress bar string"""
     progress = current / total
     filled = int(width * progress)
     bar = '█' * filled + '░' * (width - filled)
     percent = progress * 100
-    return f"[{bar}] {percent:.1f}% ({current}/{total})"
+    workers_info = f" [workers: {workers}]" if workers is not None else ""
+    return f"[{bar}] {percent:.1f}% ({current}/{total}){workers_info}"
 
 def confirm_action(message: str) -> bool:
     """Get user confirmation for an action"""